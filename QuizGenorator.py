@@ -2,20 +2,32 @@ import streamlit as st
 import os
 import sys
 import json
+import threading
 
+import numpy as np
 sys.path.append(os.path.abspath('../../'))
 from tasks.task_3.task_3_solution import DocumentProcessor
-from tasks.task_4.task_4_solution import EmbeddingClient
+from tasks.task_3.page_cache import get_shared_page_cache
+from tasks.task_4.task_4_solution import get_embedding_client
 from tasks.task_5.task_5_solution import ChromaCollectionCreator
 from tasks.task_8.task_8_solution import QuizGenerator
+from tasks.task_8.quiz_cache import get_shared_response_cache
+from tasks.task_8.question_pool import get_question_pool
 from tasks.task_9.task_9_solution import QuizManager
+from tasks.instrumentation import instrumentation, get_metrics_buffer
 
 if __name__ == "__main__":
+    # Set QUIZIFY_TRACE_FILE and/or QUIZIFY_OTEL=1 to record per-stage timings
+    instrumentation.configure_from_environment()
+    # Set QUIZIFY_ADMIN=1 to record recent metrics in memory and show the performance page
+    admin_enabled = os.environ.get("QUIZIFY_ADMIN") == "1"
+    metrics_buffer = get_metrics_buffer() if admin_enabled else None
 
     embed_config = {
         "model_name": "textembedding-gecko@003",
         "project": "my-first-project-424120",
-        "location": "us-central1"
+        "location": "us-central1",
+        "cache_path": os.path.join(".cache", "embeddings.sqlite")
     }
 
     if 'page' not in st.session_state:
@@ -26,6 +38,11 @@ if __name__ == "__main__":
         st.session_state.answers = {}
     if 'submitted_answers' not in st.session_state:
         st.session_state.submitted_answers = 0
+    if 'generation_done' not in st.session_state:
+        st.session_state.generation_done = threading.Event()
+        st.session_state.generation_done.set()
+    if 'cancel_generation' not in st.session_state:
+        st.session_state.cancel_generation = threading.Event()
     def next_page():
         st.session_state.page += 1
 
@@ -40,10 +57,56 @@ if __name__ == "__main__":
         st.session_state.correct_answers = 0
         st.session_state.answers = {} 
         st.session_state.submitted_answers = 0
+        # A quiz still generating in the background stops before its next round of LLM calls, and
+        # until then keeps appending to its own list, not the new one
+        st.session_state.cancel_generation.set()
+        st.session_state.cancel_generation = threading.Event()
+        st.session_state.generation_done = threading.Event()
+        st.session_state.generation_done.set()
+
+    def preview_first_stream(preview):
+        """
+        Returns an on_partial callback that keeps the partially streamed question of the first request in preview.
+
+        Only the first worker thread to report is followed, so concurrent questions do not overwrite each other.
+        """
+        def on_partial(question):
+            if preview.setdefault("thread", threading.get_ident()) == threading.get_ident():
+                preview["question"] = question
+        return on_partial
+
+    def show_partial_question(placeholder, question):
+        with placeholder.container():
+            st.write(question.get("question", ""))
+            for choice in question.get("choices") or []:
+                if isinstance(choice, dict) and "value" in choice:
+                    st.write(f"{choice.get('key', '')}) {choice['value']}")
+
+    @st.fragment(run_every=1)
+    def watch_generation():
+        # Reruns the page whenever a new question arrives or generation finishes
+        done = st.session_state.generation_done.is_set()
+        ready = len(st.session_state['question_bank'])
+        if (ready, done) != st.session_state.get('generation_seen'):
+            st.session_state['generation_seen'] = (ready, done)
+            st.rerun()
+        if not done:
+            st.caption(f"Generating remaining questions... {ready} ready so far.")
+
+    def show_dashboard():
+        # The quiz in progress is kept, so Back returns to the page the user left
+        if st.session_state.page != 3:
+            st.session_state.previous_page = st.session_state.page
+        st.session_state.page = 3
+
+    def leave_dashboard():
+        st.session_state.page = st.session_state.get('previous_page', 0)
 
     # Sidebar for navigation
     with st.sidebar.expander("Navigation", expanded=True):
         st.button("Home", on_click=go_home)
+        if admin_enabled:
+            st.button("Performance", on_click=show_dashboard)
 
     if st.session_state.page == 0:
         if 'question_bank' not in st.session_state or len(st.session_state['question_bank']) == 0:
@@ -56,12 +119,12 @@ if __name__ == "__main__":
 
                 with st.form("Load Data to Chroma"):
                     st.write("Select PDFs for Ingestion, the topic for the quiz, and click Generate!")
-                    processor = DocumentProcessor()
+                    processor = DocumentProcessor(parallel=True, page_cache=get_shared_page_cache(os.path.join(".cache", "pages")))
                     processor.ingest_documents()
 
-                    embed_client = EmbeddingClient(**embed_config)
+                    embed_client = get_embedding_client(**embed_config)
 
-                    chroma_creator = ChromaCollectionCreator(processor, embed_client)
+                    chroma_creator = ChromaCollectionCreator(processor, embed_client, persist_directory=os.path.join(".cache", "chroma"))
 
                     topic_input = st.text_input("Topic for Generative Quiz", placeholder="Enter the topic of the document")
                     questions = st.slider("Number of Questions", min_value=1, max_value=10, value=1)
@@ -70,17 +133,41 @@ if __name__ == "__main__":
 
                     if submitted:
                         chroma_creator.create_chroma_collection()
+                        generation_done = threading.Event()
+                        # Pre-generates questions for the documents in the background, so later quizzes are served
+                        # instantly. The build waits for this quiz, so it does not compete with it for the LLM.
+                        question_pool = get_question_pool(chroma_creator, after=generation_done) if chroma_creator.db else None
 
                         if len(processor.pages) > 0:
                             st.write(f"Generating {questions} questions for topic: {topic_input}")
 
-                        generator = QuizGenerator(topic_input, questions, chroma_creator)
-                        question_bank = generator.generate_quiz()
-                        st.session_state['question_bank'] = question_bank
-                        st.session_state['display_quiz'] = True
-                        st.session_state['question_index'] = 0
-                        next_page()
-                        st.rerun()
+                        preview = {}
+                        generator = QuizGenerator(
+                            topic_input, questions, chroma_creator, distinct_context=True,
+                            response_cache=get_shared_response_cache(similarity_threshold=0.95),
+                            question_pool=question_pool, stream_tokens=True,
+                            on_partial=preview_first_stream(preview),
+                            cancel=st.session_state.cancel_generation
+                        )
+                        # Questions are appended as they are validated; the quiz opens as soon as the first one exists
+                        question_bank = []
+                        generator.generate_quiz_in_background(question_bank, generation_done)
+                        placeholder = st.empty()
+                        while not question_bank and not generation_done.wait(0.05):
+                            # The first question renders token by token while it is being generated
+                            if "question" in preview:
+                                show_partial_question(placeholder, preview["question"])
+
+                        if question_bank:
+                            st.session_state['question_bank'] = question_bank
+                            st.session_state.generation_done = generation_done
+                            st.session_state['generation_seen'] = None
+                            st.session_state['display_quiz'] = True
+                            st.session_state['question_index'] = 0
+                            next_page()
+                            st.rerun()
+                        else:
+                            st.error("Failed to generate any questions. Please try again.")
 
     if st.session_state.page == 1:
         if st.session_state['display_quiz']:
@@ -111,13 +198,19 @@ if __name__ == "__main__":
                         st.rerun()
                         
                     if st.form_submit_button("Next Question"):
-                        quiz_manager.next_question_index(direction=1)
-                        st.rerun()
+                        is_last_ready = st.session_state["question_index"] + 1 >= quiz_manager.total_questions
+                        if is_last_ready and not st.session_state.generation_done.is_set():
+                            st.info("The next question is still being generated.")
+                        else:
+                            quiz_manager.next_question_index(direction=1)
+                            st.rerun()
 
                     if st.form_submit_button("Previous Question"):
                         quiz_manager.next_question_index(direction=-1)
                         st.rerun()
-            if st.session_state.submitted_answers >= len(st.session_state['question_bank']):
+            watch_generation()
+            if (st.session_state.generation_done.is_set()
+                    and st.session_state.submitted_answers >= len(st.session_state['question_bank'])):
                 if st.button("Results"):
                     next_page()
                     st.rerun()
@@ -157,3 +250,53 @@ if __name__ == "__main__":
                         previous_page()
                         st.rerun()
 
+    if st.session_state.page == 3 and admin_enabled:
+        # Only the admin dashboard needs pandas, so it is not imported on every cold start
+        import pandas as pd
+
+        st.header("Performance")
+        st.button("Back", on_click=leave_dashboard)
+        st.caption(f"Aggregated over the last {len(metrics_buffer.records)} recorded spans and counter updates.")
+        counters = metrics_buffer.counter_totals()
+        durations = metrics_buffer.span_durations()
+
+        def share(part, rest):
+            total = counters.get(part, 0) + counters.get(rest, 0)
+            return f"{counters.get(part, 0) / total:.0%}" if total else "n/a"
+
+        columns = st.columns(4)
+        columns[0].metric("Embedding calls", counters.get("embedding.calls", 0))
+        columns[1].metric("LLM calls", counters.get("llm.calls", 0))
+        columns[2].metric("Prompt tokens", counters.get("llm.prompt_tokens", 0))
+        columns[3].metric("Output tokens", counters.get("llm.output_tokens", 0))
+
+        columns = st.columns(4)
+        columns[0].metric("Page cache hits", share("page_cache.hits", "page_cache.misses"))
+        columns[1].metric("Embedding cache hits", share("embedding.cache_hits", "embedding.cache_misses"))
+        columns[2].metric("Response cache hits", share("quiz.response_cache_hits", "quiz.response_cache_misses"))
+        columns[3].metric("Question pool hits", share("quiz.question_pool_hits", "quiz.question_pool_misses"))
+
+        columns = st.columns(4)
+        columns[0].metric("Duplicates rejected", share("quiz.duplicates_rejected", "quiz.questions_accepted"))
+        columns[1].metric("Malformed responses", counters.get("llm.malformed_responses", 0))
+        columns[2].metric("Transient errors", counters.get("llm.transient_errors", 0))
+        columns[3].metric("Embedding tokens", counters.get("embedding.tokens", 0))
+
+        if durations:
+            st.subheader("Stage latency")
+            st.dataframe(pd.DataFrame([
+                {
+                    "stage": name,
+                    "count": len(values),
+                    "p50 ms": np.percentile(values, 50),
+                    "p95 ms": np.percentile(values, 95),
+                    "max ms": max(values),
+                }
+                for name, values in sorted(durations.items())
+            ]).set_index("stage"))
+
+            stage = st.selectbox("Latency histogram", sorted(durations))
+            counts, edges = np.histogram(durations[stage], bins=20)
+            st.bar_chart(pd.DataFrame({"spans": counts}, index=pd.Index(edges[:-1].round(1), name="ms")))
+        else:
+            st.write("No metrics recorded yet. Generate a quiz to see stage latencies.")
@@ -0,0 +1,75 @@
+# Microbenchmark: per-question overhead of rebuilding the retrieval chain vs. reusing it.
+#
+# Run from the repository root:
+#   python benchmarks/bench_chain_reuse.py
+
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath('.'))
+from langchain_core.documents import Document
+from langchain_core.language_models import FakeListLLM
+from langchain_core.runnables import RunnableLambda
+from tasks.task_8.task_8_solution import QuizGenerator
+
+QUESTION = json.dumps({
+    "question": "What is the capital of France?",
+    "choices": [
+        {"key": "A", "value": "Paris"},
+        {"key": "B", "value": "Lyon"},
+        {"key": "C", "value": "Nice"},
+        {"key": "D", "value": "Lille"}
+    ],
+    "answer": "A",
+    "explanation": "Paris is the capital of France."
+})
+
+
+class StubVectorstore:
+    """
+    A vectorstore stand-in whose retriever returns a fixed document without any embedding call.
+    """
+    def as_retriever(self):
+        return RunnableLambda(lambda query: [Document(page_content=f"Context for {query}")])
+
+
+def time_build(iterations):
+    generator = QuizGenerator("Geography", 1, StubVectorstore())
+    generator.llm = FakeListLLM(responses=[QUESTION])
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        generator.build_chain()
+    return (time.perf_counter() - start) / iterations
+
+
+def run(rebuild, iterations):
+    generator = QuizGenerator("Geography", 1, StubVectorstore())
+    generator.llm = FakeListLLM(responses=[QUESTION])
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        if rebuild:
+            generator.invalidate_chain()
+        generator.generate_question_with_vectorstore()
+    return (time.perf_counter() - start) / iterations
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    rounds = 5
+
+    # Interleave the rounds and keep the best of each, so warm-up and noise affect both modes equally
+    build = min(time_build(iterations) for _ in range(rounds))
+    rebuilt, reused = float("inf"), float("inf")
+    for _ in range(rounds):
+        rebuilt = min(rebuilt, run(rebuild=True, iterations=iterations))
+        reused = min(reused, run(rebuild=False, iterations=iterations))
+
+    print(f"Chain construction alone:   {build * 1e6:8.1f} us")
+    print(f"Rebuild chain per question: {rebuilt * 1e6:8.1f} us/question")
+    print(f"Reuse compiled chain:       {reused * 1e6:8.1f} us/question")
+    print(f"Saving:                     {(rebuilt - reused) * 1e6:8.1f} us/question ({(1 - reused / rebuilt) * 100:.1f}%)")
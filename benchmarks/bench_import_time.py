@@ -0,0 +1,104 @@
+# Cold-start benchmark: how long importing the Streamlit app and the task modules takes.
+#
+# Each module is imported in a fresh interpreter under `python -X importtime`, so nothing is cached
+# from a previous run. The report gives the total import time of every module, median over the repeats,
+# and the packages that take the longest to import when the app starts.
+# Optionally, the first render of the app's start page is timed with Streamlit's AppTest.
+#
+# Run from the repository root:
+#   python benchmarks/bench_import_time.py --repeats 5 --top 15 --render
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+MODULES = [
+    "QuizGenorator",
+    "tasks.task_3.task_3_solution",
+    "tasks.task_4.task_4_solution",
+    "tasks.task_5.task_5_solution",
+    "tasks.task_8.task_8_solution",
+    "tasks.task_9.task_9_solution",
+]
+
+IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_times(module):
+    """
+    Imports a module in a fresh interpreter with -X importtime.
+
+    :param module: The dotted name of the module.
+    :return: A dictionary of the imported modules mapped to their own and cumulative import times in seconds.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.abspath('.')
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            own, cumulative, _, name = match.groups()
+            times[name] = (int(own) / 1e6, int(cumulative) / 1e6)
+    return times
+
+
+def first_render_time():
+    """
+    Times the first run of the app script in a fresh interpreter, from the start of the import to the start page being rendered.
+    """
+    script = (
+        "import time; start = time.perf_counter()\n"
+        "from streamlit.testing.v1 import AppTest\n"
+        f"app = AppTest.from_file({os.path.abspath('QuizGenorator.py')!r}, default_timeout=60).run()\n"
+        "assert not app.exception, app.exception\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=os.path.abspath('.'))
+    if result.returncode != 0:
+        raise RuntimeError(f"Rendering the app failed:\n{result.stderr[-2000:]}")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--render", action="store_true", help="Also time the first render of the start page.")
+    args = parser.parse_args()
+
+    print(f"{'module':<32} {'median s':>9} {'min s':>9}")
+    app_runs = []
+    for module in MODULES:
+        runs = [import_times(module) for _ in range(args.repeats)]
+        totals = [run[module][1] for run in runs]
+        print(f"{module:<32} {statistics.median(totals):>9.3f} {min(totals):>9.3f}")
+        if module == "QuizGenorator":
+            app_runs = runs
+
+    # A package's cost is the own time of all its modules, since a package's __init__ often
+    # imports few of its submodules and the rest are imported on their own by other packages
+    packages = {}
+    for run in app_runs:
+        totals = {}
+        for name, (own, _) in run.items():
+            package = name.split(".")[0]
+            totals[package] = totals.get(package, 0) + own
+        for package, total in totals.items():
+            packages.setdefault(package, []).append(total)
+    heaviest = sorted(packages.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+
+    print(f"\nHeaviest packages imported by QuizGenorator (median of {args.repeats} runs)")
+    for name, totals in heaviest[:args.top]:
+        print(f"  {name:<30} {statistics.median(totals):>7.3f} s")
+
+    if args.render:
+        renders = [first_render_time() for _ in range(args.repeats)]
+        print(f"\nFirst render of the start page: median {statistics.median(renders):.3f} s, min {min(renders):.3f} s")
@@ -0,0 +1,116 @@
+# Benchmark: temp-file PDF ingestion (the previous DocumentProcessor behaviour) vs. parsing from memory.
+#
+# The fixture PDF is generated once; each mode then runs in a fresh subprocess that loads it into
+# memory (like a Streamlit upload). Ingestion is timed once, then run again under tracemalloc to
+# measure the peak memory it allocates on top of the upload buffer. Disk writes are read from
+# /proc/self/io and are only reported on Linux.
+#
+# Run from the repository root:
+#   python benchmarks/bench_pdf_ingest.py --size-mb 100
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+sys.path.append(os.path.abspath('.'))
+from benchmarks.synthetic_pdf import make_pdf, InMemoryUpload
+
+
+def written_bytes():
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def ingest_with_temp_file(upload):
+    from langchain_community.document_loaders import PyPDFLoader
+
+    original_name, file_extension = os.path.splitext(upload.name)
+    temp_file_path = os.path.join(tempfile.gettempdir(), f"{original_name}_{uuid.uuid4().hex}{file_extension}")
+    with open(temp_file_path, 'wb') as f:
+        f.write(upload.getvalue())
+    pages = PyPDFLoader(temp_file_path).load_and_split()
+    os.unlink(temp_file_path)
+    return pages
+
+
+def ingest_from_memory(upload):
+    from tasks.task_3.task_3_solution import DocumentProcessor
+
+    processor = DocumentProcessor()
+    processor.process_files([upload])
+    return processor.pages
+
+
+def run_mode(mode, fixture_path):
+    with open(fixture_path, "rb") as f:
+        data = f.read()
+    upload = InMemoryUpload("synthetic.pdf", data)
+    ingest = ingest_with_temp_file if mode == "tempfile" else ingest_from_memory
+
+    # Warm up the imports so they are not counted as ingestion time
+    ingest(InMemoryUpload("warmup.pdf", make_pdf(1)))
+
+    written_before = written_bytes()
+    start = time.perf_counter()
+    pages = ingest(upload)
+    elapsed = time.perf_counter() - start
+    written_after = written_bytes()
+
+    tracemalloc.start()
+    ingest(upload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(json.dumps({
+        "mode": mode,
+        "file_mb": len(data) / 1024 / 1024,
+        "pages": len(pages),
+        "seconds": elapsed,
+        "written_mb": None if written_before is None else (written_after - written_before) / 1024 / 1024,
+        "peak_alloc_mb": peak / 1024 / 1024,
+    }))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--mode", choices=["tempfile", "memory"])
+    parser.add_argument("--fixture")
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.fixture)
+        sys.exit(0)
+
+    fixture_path = os.path.join(tempfile.gettempdir(), f"quizify_bench_{uuid.uuid4().hex}.pdf")
+    with open(fixture_path, "wb") as f:
+        f.write(make_pdf(args.pages, padding_bytes=args.size_mb * 1024 * 1024))
+
+    def fmt(value):
+        return "n/a" if value is None else f"{value:.1f}"
+
+    try:
+        print(f"{'mode':<10} {'file MB':>8} {'pages':>6} {'seconds':>8} {'written MB':>11} {'peak alloc MB':>14}")
+        for mode in ("tempfile", "memory"):
+            output = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--fixture", fixture_path],
+                capture_output=True, text=True, check=True
+            ).stdout.strip().splitlines()[-1]
+            result = json.loads(output)
+            print(f"{result['mode']:<10} {result['file_mb']:>8.1f} {result['pages']:>6} {result['seconds']:>8.3f} "
+                  f"{fmt(result['written_mb']):>11} {fmt(result['peak_alloc_mb']):>14}")
+    finally:
+        os.unlink(fixture_path)
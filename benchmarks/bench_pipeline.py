@@ -0,0 +1,132 @@
+# End-to-end benchmark of the quiz pipeline, offline.
+#
+# Drives the real DocumentProcessor -> ChromaCollectionCreator -> QuizGenerator -> QuizManager path on
+# synthetic PDFs, with the deterministic stand-ins from benchmarks/fakes.py in place of Vertex AI.
+# Each stage is timed over several repeats, then run once more under tracemalloc to measure the peak
+# memory it allocates. Throughput is reported in the stage's own unit: pages, chunks or questions.
+#
+# Run from the repository root:
+#   python benchmarks/bench_pipeline.py --files 4 --pages 50 --questions 5 --llm-latency 0.2
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.abspath('.'))
+from benchmarks.fakes import HashingEmbeddings, FakeQuizLLM
+from benchmarks.synthetic_pdf import make_pdf, InMemoryUpload
+from tasks.task_3.task_3_solution import DocumentProcessor
+from tasks.task_4.task_4_solution import EmbeddingClient
+from tasks.task_5.task_5_solution import ChromaCollectionCreator
+from tasks.task_8.task_8_solution import QuizGenerator
+from tasks.task_9.task_9_solution import QuizManager
+
+TOPICS = ["photosynthesis", "mitochondria energy", "genome mutation", "cell membrane transport", "species habitat"]
+
+
+def measure(name, unit, repeats, run):
+    """
+    Times run() repeats times, then runs it once more under tracemalloc.
+
+    :param run: A function that performs one repeat of the stage and returns the number of items it processed.
+    :return: A dictionary with the stage's results.
+    """
+    latencies, items = [], 0
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        items += run(repeat)
+        latencies.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    run(repeats)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "stage": name,
+        "unit": unit,
+        "throughput": items / sum(latencies),
+        "p50_ms": float(np.percentile(latencies, 50)) * 1000,
+        "p99_ms": float(np.percentile(latencies, 99)) * 1000,
+        "peak_mb": peak / 1024 / 1024,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--embed-latency", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    parser.add_argument("--transient-error-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    uploads = [InMemoryUpload(f"synthetic_{index}.pdf", make_pdf(args.pages, seed=index)) for index in range(args.files)]
+    embedder = HashingEmbeddings(latency=args.embed_latency)
+    embed_client = EmbeddingClient("hashing", project=None, location=None, client=embedder)
+    llm = FakeQuizLLM(
+        latency=args.llm_latency, failure_rate=args.failure_rate, transient_error_rate=args.transient_error_rate
+    )
+    work_directory = tempfile.mkdtemp(prefix="quizify_bench_")
+    state = {"quizzes": 0, "wasted_attempts": 0}
+
+    def ingest(repeat):
+        processor = DocumentProcessor()
+        processor.process_files(uploads)
+        state["processor"] = processor
+        return len(processor.pages)
+
+    def embed_and_insert(repeat):
+        # A fresh persist directory per repeat, so the collection is embedded and inserted every time
+        creator = ChromaCollectionCreator(
+            state["processor"], embed_client, persist_directory=os.path.join(work_directory, f"chroma_{repeat}")
+        )
+        creator.create_chroma_collection()
+        state["creator"] = creator
+        return creator.db._collection.count()
+
+    def generate(repeat):
+        generator = QuizGenerator(
+            TOPICS[repeat % len(TOPICS)], args.questions, state["creator"],
+            distinct_context=True, backoff_base=0.01, llm=llm
+        )
+        state["questions"] = generator.generate_quiz()
+        state["quizzes"] += 1
+        state["wasted_attempts"] += generator.wasted_attempts
+        return len(state["questions"])
+
+    def take_quiz(repeat):
+        quiz_manager = QuizManager(state["questions"])
+        for index in range(quiz_manager.total_questions):
+            question = quiz_manager.get_question_at_index(index)
+            [f"{choice['key']}) {choice['value']}" for choice in question["choices"]]
+        return quiz_manager.total_questions
+
+    try:
+        results = [
+            measure("ingest", "pages/s", args.repeats, ingest),
+            measure("embed+insert", "chunks/s", args.repeats, embed_and_insert),
+            measure("generate", "questions/s", args.repeats, generate),
+            measure("quiz manager", "questions/s", args.repeats, take_quiz),
+        ]
+    finally:
+        shutil.rmtree(work_directory, ignore_errors=True)
+
+    print(f"{args.files} files x {args.pages} pages, {args.questions} questions per quiz, "
+          f"{args.repeats} repeats, {embedder.calls} embedding calls, {llm.calls} LLM calls")
+    # Malformed and failed responses show up here, so --failure-rate and --transient-error-rate can be checked
+    print(f"{state['wasted_attempts']} wasted attempts over {state['quizzes']} quizzes "
+          f"(failure rate {args.failure_rate:.0%}, transient error rate {args.transient_error_rate:.0%})")
+    print(f"{'stage':<14} {'throughput':>12} {'unit':<12} {'p50 ms':>9} {'p99 ms':>9} {'peak MB':>8}")
+    for result in results:
+        print(f"{result['stage']:<14} {result['throughput']:>12.1f} {result['unit']:<12} "
+              f"{result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['peak_mb']:>8.1f}")
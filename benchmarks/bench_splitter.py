@@ -0,0 +1,130 @@
+# Benchmark of the chunk splitters: embedding cost, chunk counts and retrieval hit quality.
+#
+# The fixture corpus is generated text laid out like text extracted from a PDF: paragraphs separated
+# by blank lines, with lines wrapped at a fixed width. Every paragraph is about an invented term,
+# opens with a sentence naming it and holds one fact sentence about it. For each fact, a paraphrased
+# question naming the term and the place is embedded and the chunks are ranked by cosine similarity,
+# with the hashing embeddings from benchmarks/fakes.py. A query is a hit at k if one of the top k
+# chunks contains the whole fact sentence.
+#
+# Embedding cost is the number of tokens sent to the embedding model, estimated like EmbeddingClient
+# does, relative to the tokens in the corpus itself. The chunk size spread is the coefficient of
+# variation of the chunk token counts, and "mid-sentence" is the share of chunks that end inside a
+# sentence.
+#
+# Run from the repository root:
+#   python benchmarks/bench_splitter.py --pages 40
+
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+sys.path.append(os.path.abspath('.'))
+from benchmarks.fakes import HashingEmbeddings
+from benchmarks.synthetic_pdf import WORDS
+from tasks.task_4.task_4_solution import EmbeddingClient
+from tasks.task_5.task_5_solution import ChromaCollectionCreator
+
+CONFIGS = [
+    ("character 1000/200", {"method": "character", "separator": "\n", "chunk_size": 1000, "chunk_overlap": 200}),
+    ("recursive 320/0", {"chunk_overlap": 0}),
+    ("recursive 320/64 fixed", {"adaptive_overlap": False}),
+    ("recursive 320/64 adaptive", {}),
+]
+
+SYLLABLES = "ka lo mi ren tor vash qui zel dun fa sor bel nix ar pe tul gom ish".split()
+
+
+def wrap(text, width):
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    return "\n".join(lines + [line])
+
+
+def make_corpus(num_pages, paragraphs_per_page=6, line_width=90, seed=0):
+    """
+    Builds the fixture corpus.
+
+    :return: A tuple of the page Documents and a list of (query, fact sentence) pairs.
+    """
+    rng = random.Random(seed)
+    used = set()
+
+    def coin():
+        word = "".join(rng.choice(SYLLABLES) for _ in range(3))
+        while word in used:
+            word = "".join(rng.choice(SYLLABLES) for _ in range(3))
+        used.add(word)
+        return word
+
+    pages, queries = [], []
+    for page_number in range(num_pages):
+        paragraphs = []
+        for _ in range(paragraphs_per_page):
+            term, discoverer, place = coin(), coin().capitalize(), coin().capitalize()
+
+            # Only the opening sentence names the term, like a paragraph introducing its subject
+            sentences = [
+                " ".join(([term] if index == 0 else []) + [rng.choice(WORDS) for _ in range(rng.randint(8, 24))]).capitalize() + "."
+                for index in range(rng.randint(2, 12))
+            ]
+            fact = f"The {term} was catalogued by {discoverer} in {rng.randint(1800, 1990)} at {place}."
+            sentences.insert(rng.randint(0, len(sentences)), fact)
+            paragraphs.append(wrap(" ".join(sentences), line_width))
+            queries.append((f"Which explorer documented {term} near {place}?", fact))
+        pages.append(Document(page_content="\n\n".join(paragraphs), metadata={"page": page_number}))
+    return pages, queries
+
+
+def normalize(text):
+    return re.sub(r"\s+", " ", text).strip()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pages, queries = make_corpus(args.pages, seed=args.seed)
+    embed_client = EmbeddingClient("hashing", project=None, location=None, client=HashingEmbeddings(dimensions=8192))
+    corpus_tokens = sum(EmbeddingClient.estimate_tokens(page.page_content) for page in pages)
+    query_vectors = np.asarray(embed_client.embed_documents([query for query, _ in queries]))
+    facts = [normalize(fact) for _, fact in queries]
+
+    print(f"{len(pages)} pages, {len(queries)} queries, {corpus_tokens} corpus tokens")
+    print(f"{'splitter':<26} {'chunks':>7} {'tokens':>8} {'overhead':>9} {'size cv':>8} {'mid-sentence':>13} "
+          f"{'hit@1':>6} {'hit@4':>6} {'split ms':>9}")
+    for name, settings in CONFIGS:
+        creator = ChromaCollectionCreator(None, embed_client, splitter_settings=settings)
+        start = time.perf_counter()
+        chunks = creator.split_documents(pages)
+        split_ms = (time.perf_counter() - start) * 1000
+
+        texts = [chunk.page_content for chunk in chunks]
+        tokens = [EmbeddingClient.estimate_tokens(text) for text in texts]
+        chunk_vectors = np.asarray(embed_client.embed_documents(texts))
+        ranking = np.argsort(-(query_vectors @ chunk_vectors.T), axis=1)
+        normalized = [normalize(text) for text in texts]
+        cut = sum(not text.endswith((".", "!", "?")) for text in normalized) / len(texts)
+        hits = [
+            next((rank for rank, index in enumerate(ranking[query][:4]) if fact in normalized[index]), None)
+            for query, fact in enumerate(facts)
+        ]
+
+        print(f"{name:<26} {len(chunks):>7} {sum(tokens):>8} {sum(tokens) / corpus_tokens - 1:>9.1%} "
+              f"{statistics.pstdev(tokens) / statistics.mean(tokens):>8.2f} {cut:>13.1%} "
+              f"{sum(hit == 0 for hit in hits) / len(hits):>6.1%} "
+              f"{sum(hit is not None for hit in hits) / len(hits):>6.1%} {split_ms:>9.1f}")
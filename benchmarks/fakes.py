@@ -0,0 +1,152 @@
+# Local stand-ins for the Vertex AI embedding model and LLM, so the pipeline can be benchmarked offline.
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from typing import Any
+
+import numpy as np
+from google.api_core import exceptions as google_exceptions
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+
+class HashingEmbeddings:
+    """
+    A deterministic embedding model based on feature hashing.
+
+    Every word is hashed into one of `dimensions` buckets with a hashed sign, so texts that share
+    words get similar vectors and retrieval behaves plausibly. Text without any words gets a random
+    vector seeded by the hash of the text. The same text always produces the same vector.
+
+    :param dimensions: The length of the vectors.
+    :param latency: Seconds slept per call, to simulate the network round trip.
+    """
+
+    def __init__(self, dimensions=768, latency=0.0):
+        self.dimensions = dimensions
+        self.latency = latency
+        self.calls = 0
+        self.texts = 0
+        self.lock = threading.Lock()
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            value = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "big")
+            vector[value % self.dimensions] += 1.0 if value >> 63 else -1.0
+
+        norm = np.linalg.norm(vector)
+        if not norm:
+            seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+            vector = np.random.default_rng(seed).standard_normal(self.dimensions).astype(np.float32)
+            norm = np.linalg.norm(vector)
+        return (vector / norm).tolist()
+
+    def _record(self, count):
+        with self.lock:
+            self.calls += 1
+            self.texts += count
+        if self.latency:
+            time.sleep(self.latency)
+
+    def embed_documents(self, texts):
+        self._record(len(texts))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        self._record(1)
+        return self._embed(text)
+
+
+class _Draws:
+    """
+    The mutable state of a FakeQuizLLM: a call counter and a seeded random generator, shared by worker threads.
+    """
+
+    def __init__(self, seed):
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.count = 0
+
+
+class FakeQuizLLM(LLM):
+    """
+    An LLM that returns canned multiple-choice questions in the JSON format the quiz prompts ask for.
+
+    Each response is unique, so responses are not rejected as duplicates. Failures are drawn from a
+    seeded random generator. A malformed response is cut off halfway through its JSON, like a response
+    that hit the output token limit: it still parses, but the question lacks required fields and is
+    rejected by QuizGenerator.is_well_formed. A transient failure raises ServiceUnavailable, like a
+    throttled Vertex AI call. Streamed chunks are reported to the callbacks as new tokens, like the
+    Vertex AI client does.
+    """
+
+    latency: float = 0.0
+    failure_rate: float = 0.0
+    transient_error_rate: float = 0.0
+    seed: int = 0
+    draws: Any = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.draws = _Draws(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-quiz"
+
+    @property
+    def calls(self) -> int:
+        return self.draws.count
+
+    def _draw(self):
+        with self.draws.lock:
+            self.draws.count += 1
+            return self.draws.count, self.draws.rng.random(), self.draws.rng.random()
+
+    def _respond(self, prompt):
+        number, failure_draw, error_draw = self._draw()
+        if self.latency:
+            time.sleep(self.latency)
+        if error_draw < self.transient_error_rate:
+            raise google_exceptions.ServiceUnavailable("Simulated transient error.")
+
+        # Batch prompts ask for a JSON array of several questions
+        match = re.search(r"create (\d+) quiz questions", prompt)
+        count = int(match.group(1)) if match else 1
+        questions = [self._question(f"{number}-{index}", prompt) for index in range(count)]
+        text = json.dumps(questions if match else questions[0])
+
+        if failure_draw < self.failure_rate:
+            return text[:len(text) // 2]
+        return text
+
+    @staticmethod
+    def _question(label, prompt):
+        topic = hashlib.blake2b(prompt.encode("utf-8"), digest_size=4).hexdigest()
+        return {
+            "question": f"Which statement about section {topic} is correct (variant {label})?",
+            "choices": [
+                {"key": "A", "value": f"Statement {label} A"},
+                {"key": "B", "value": f"Statement {label} B"},
+                {"key": "C", "value": f"Statement {label} C"},
+                {"key": "D", "value": f"Statement {label} D"},
+            ],
+            "answer": "A",
+            "explanation": f"Statement {label} A is supported by the context.",
+        }
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        return self._respond(prompt)
+
+    def _stream(self, prompt, stop=None, run_manager=None, **kwargs):
+        text = self._respond(prompt)
+        for start in range(0, len(text), 16):
+            chunk = GenerationChunk(text=text[start:start + 16])
+            if run_manager is not None:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
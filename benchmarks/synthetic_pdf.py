@@ -0,0 +1,77 @@
+# Synthetic PDF fixtures for the benchmarks, generated without any third-party dependency.
+
+import random
+
+WORDS = (
+    "photosynthesis chlorophyll enzyme membrane protein nucleus mitochondria energy glucose oxygen "
+    "carbon dioxide light reaction cycle molecule atom electron gradient transport structure function "
+    "evolution species habitat population genome mutation inheritance cell tissue organ system"
+).split()
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(num_pages, lines_per_page=40, seed=0, padding_bytes=0):
+    """
+    Builds a PDF with num_pages pages of pseudo-random text.
+
+    :param num_pages: The number of pages.
+    :param lines_per_page: The number of text lines on each page.
+    :param seed: Seed for the random text, so the same arguments always produce the same bytes.
+    :param padding_bytes: Extra bytes stored in an unreferenced stream object, to reach a target file size.
+    :return: The PDF file as bytes.
+    """
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page_number in range(num_pages):
+        lines = [f"Page {page_number + 1}."]
+        for _ in range(lines_per_page):
+            lines.append(" ".join(rng.choice(WORDS) for _ in range(10)) + ".")
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td"]
+        ops += [f"({_escape(line)}) Tj T*" for line in lines]
+        ops.append("ET")
+        content = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+
+    if padding_bytes:
+        objects.append(b"<< /Length %d >>\nstream\n" % padding_bytes + b"x" * padding_bytes + b"\nendstream")
+
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode("ascii")
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % num_pages
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+class InMemoryUpload:
+    """
+    Mimics Streamlit's UploadedFile: a named file whose bytes are returned by getvalue().
+    """
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+
+    def getvalue(self):
+        return self.data
@@ -0,0 +1,482 @@
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+class Span:
+    """
+    A timed section of the pipeline, used as a context manager.
+
+    Spans opened while another span is open in the same context are recorded as its children. Worker
+    threads start with an empty context, so work handed to them is run in a copy of the submitting
+    context (contextvars.copy_context().run) to nest under the submitting span. Attributes can be added
+    with set() until the span ends. A span that exits with an exception records the exception type as
+    its "error" attribute.
+    """
+
+    __slots__ = ("instrumentation", "name", "attributes", "span_id", "parent_id", "start", "start_perf")
+
+    def __init__(self, instrumentation, name, attributes):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.attributes = attributes
+        self.span_id = next(instrumentation.span_ids)
+        self.parent_id = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self._begin()
+        self._push()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._pop()
+        self._end(exc_type)
+        return False
+
+    def iterate(self, iterator):
+        """
+        Runs an iterator inside the span. The span stays open until the iterator is exhausted or
+        closed, but it is only the current span while the iterator runs, not while the caller
+        handles the items it yields.
+
+        :param iterator: The iterator, e.g. a generator.
+        :return: An iterator of the same items.
+        """
+        self._begin()
+        exc_type = None
+        try:
+            while True:
+                self._push()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self._pop()
+                yield item
+        except GeneratorExit:
+            # The caller stopped iterating early, which is not an error
+            raise
+        except BaseException as e:
+            exc_type = type(e)
+            raise
+        finally:
+            if hasattr(iterator, "close"):
+                self._push()
+                try:
+                    iterator.close()
+                finally:
+                    self._pop()
+            self._end(exc_type)
+
+    def _begin(self):
+        stack = self.instrumentation.span_stack()
+        self.parent_id = stack[-1].span_id if stack else None
+        self.start = time.time()
+        self.start_perf = time.perf_counter()
+
+    def _push(self):
+        current = self.instrumentation.current_spans
+        current.set(current.get() + (self,))
+
+    def _pop(self):
+        current = self.instrumentation.current_spans
+        stack = current.get()
+        if stack and stack[-1] is self:
+            current.set(stack[:-1])
+
+    def _end(self, exc_type):
+        duration = time.perf_counter() - self.start_perf
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        self.instrumentation.emit({
+            "type": "span",
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": duration * 1000,
+            "attributes": self.attributes,
+        })
+
+
+class _NoopSpan:
+    """
+    The span returned while instrumentation is disabled; every method does nothing.
+    """
+
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def iterate(self, iterator):
+        return iterator
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Instrumentation:
+    """
+    This class records spans and counters for the quiz pipeline and hands them to exporters.
+
+    Instrumentation is disabled until enable() is called. While it is disabled, span() returns a
+    shared no-op span and count() returns immediately, so instrumented code pays one attribute check.
+    Counter totals are also kept in memory and can be read with counter().
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.exporters = []
+        self.counters = {}  # (name, sorted attribute items) -> total
+        self.lock = threading.Lock()
+        self.span_ids = itertools.count(1)
+        self.current_spans = contextvars.ContextVar(f"quizify_spans_{id(self)}", default=())
+        self.llm_callback = LLMUsageCallback(self)
+        self.configured_from_environment = False
+
+    def enable(self, *exporters):
+        """
+        Turns instrumentation on and adds exporters.
+
+        :param exporters: Objects with export(record) and close() methods.
+        """
+        with self.lock:
+            self.exporters.extend(exporters)
+            self.enabled = True
+
+    def disable(self):
+        """
+        Turns instrumentation off and closes every exporter.
+        """
+        with self.lock:
+            self.enabled = False
+            exporters, self.exporters = self.exporters, []
+        for exporter in exporters:
+            exporter.close()
+
+    def configure_from_environment(self):
+        """
+        Enables instrumentation once per process from environment variables:
+        QUIZIFY_TRACE_FILE names a JSON-lines file to export to, and QUIZIFY_OTEL=1 adds the OpenTelemetry exporter.
+        """
+        if self.configured_from_environment:
+            return
+        self.configured_from_environment = True
+
+        exporters = []
+        if os.environ.get("QUIZIFY_TRACE_FILE"):
+            exporters.append(JsonLinesExporter(os.environ["QUIZIFY_TRACE_FILE"]))
+        if os.environ.get("QUIZIFY_OTEL") == "1":
+            exporters.append(OpenTelemetryExporter())
+        if exporters:
+            self.enable(*exporters)
+
+    def span_stack(self) -> tuple:
+        """
+        Returns the spans open in the current context, from the outermost to the innermost.
+        """
+        return self.current_spans.get()
+
+    def span(self, name, **attributes):
+        """
+        Opens a span.
+
+        :param name: The name of the pipeline stage.
+        :param attributes: Initial span attributes.
+        :return: A context manager whose set() method adds attributes.
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def count(self, name, value=1, **attributes):
+        """
+        Adds value to a counter, e.g. a call count, a byte count or cache hits.
+
+        :param name: The counter name.
+        :param value: The amount to add.
+        :param attributes: Attributes that distinguish series of the same counter.
+        """
+        if not self.enabled or not value:
+            return
+        key = (name, tuple(sorted(attributes.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        self.emit({"type": "counter", "name": name, "value": value, "time": time.time(), "attributes": attributes})
+
+    def counter(self, name, **attributes):
+        """
+        Returns the total of a counter since instrumentation was first enabled.
+        """
+        return self.counters.get((name, tuple(sorted(attributes.items()))), 0)
+
+    def emit(self, record):
+        for exporter in self.exporters:
+            try:
+                exporter.export(record)
+            except Exception as e:
+                print(f"Failed to export {record['type']} {record['name']}: {e}")
+
+
+class LLMUsageCallback(BaseCallbackHandler):
+    """
+    A LangChain callback handler that records every LLM call as an "llm" span with its token usage.
+
+    The span is a child of the span that was current when the call started. Token counts reported by
+    the model are used when present. Otherwise they are estimated from the prompt and completion
+    lengths, and the span's "estimated_tokens" attribute is True. A stream that is closed before the
+    model finished, e.g. once the question JSON is complete, ends normally with the text received so far.
+    """
+
+    def __init__(self, instrumentation):
+        self.instrumentation = instrumentation
+        self.runs = {}
+
+    @staticmethod
+    def estimate_tokens(text):
+        return len(text) // 4 + 1
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        stack = self.instrumentation.span_stack()
+        self.runs[run_id] = {
+            "start": time.time(),
+            "start_perf": time.perf_counter(),
+            "parent_id": stack[-1].span_id if stack else None,
+            "prompt_chars": sum(len(prompt) for prompt in prompts),
+            "prompt_tokens": sum(self.estimate_tokens(prompt) for prompt in prompts),
+            "tokens": [],
+        }
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        run = self.runs.get(run_id)
+        if run is not None:
+            run["tokens"].append(token)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, response, None)
+
+    def on_llm_error(self, error, *, run_id, response=None, **kwargs):
+        # Closing a stream early raises GeneratorExit inside the LLM's stream
+        self._finish(run_id, response, None if isinstance(error, GeneratorExit) else type(error).__name__)
+
+    def _finish(self, run_id, response, error):
+        run = self.runs.pop(run_id, None)
+        if run is None or not self.instrumentation.enabled:
+            return
+
+        generations = [generation for generations in response.generations for generation in generations] if response else []
+        usage = {}
+        for generation in generations:
+            usage = (generation.generation_info or {}).get("usage_metadata") or usage
+        # Streamed tokens are complete even when the stream was closed before the LLM could aggregate them
+        texts = ["".join(run["tokens"])] if run["tokens"] else [generation.text for generation in generations]
+
+        prompt_tokens = usage.get("prompt_token_count")
+        output_tokens = usage.get("candidates_token_count")
+        estimated = prompt_tokens is None or output_tokens is None
+        if estimated:
+            prompt_tokens = run["prompt_tokens"]
+            output_tokens = sum(self.estimate_tokens(text) for text in texts)
+
+        attributes = {
+            "prompt_chars": run["prompt_chars"],
+            "output_chars": sum(len(text) for text in texts),
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "estimated_tokens": estimated,
+        }
+        if error:
+            attributes["error"] = error
+        self.instrumentation.emit({
+            "type": "span",
+            "name": "llm",
+            "span_id": next(self.instrumentation.span_ids),
+            "parent_id": run["parent_id"],
+            "start": run["start"],
+            "duration_ms": (time.perf_counter() - run["start_perf"]) * 1000,
+            "attributes": attributes,
+        })
+        self.instrumentation.count("llm.calls")
+        self.instrumentation.count("llm.prompt_tokens", prompt_tokens)
+        self.instrumentation.count("llm.output_tokens", output_tokens)
+
+
+class JsonLinesExporter:
+    """
+    Appends every span and counter update to a file, one JSON object per line.
+
+    :param path: The path of the file. It is created if it does not exist.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8", buffering=1)
+        self.lock = threading.Lock()
+
+    def export(self, record):
+        line = json.dumps(record, default=str)
+        with self.lock:
+            self.file.write(line + "\n")
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class RingBufferExporter:
+    """
+    Keeps the most recent spans and counter updates in memory, for an in-app dashboard.
+
+    Exporting only appends to a bounded deque; records are aggregated when they are read, so the
+    buffer costs nothing beyond the append while nobody is looking at it.
+
+    :param max_records: The number of records kept. Older records are discarded.
+    """
+
+    def __init__(self, max_records=5000):
+        self.records = deque(maxlen=max_records)
+
+    def export(self, record):
+        self.records.append(record)
+
+    def span_durations(self) -> dict:
+        """
+        :return: A dictionary of span names mapped to the durations in milliseconds of their recent spans.
+        """
+        durations = {}
+        for record in list(self.records):
+            if record["type"] == "span":
+                durations.setdefault(record["name"], []).append(record["duration_ms"])
+        return durations
+
+    def counter_totals(self) -> dict:
+        """
+        :return: A dictionary of counter names mapped to the sum of their recent updates.
+        """
+        totals = {}
+        for record in list(self.records):
+            if record["type"] == "counter":
+                totals[record["name"]] = totals.get(record["name"], 0) + record["value"]
+        return totals
+
+    def close(self):
+        pass
+
+
+_metrics_buffer = None
+_metrics_buffer_lock = threading.Lock()
+
+def get_metrics_buffer(max_records=5000):
+    """
+    Returns the process-wide ring buffer of recent metrics, creating it and enabling instrumentation on first use.
+
+    :param max_records: The size of the buffer, used when it is first created.
+    :return: The shared RingBufferExporter.
+    """
+    global _metrics_buffer
+    with _metrics_buffer_lock:
+        if _metrics_buffer is None:
+            _metrics_buffer = RingBufferExporter(max_records)
+            instrumentation.enable(_metrics_buffer)
+        return _metrics_buffer
+
+
+class OpenTelemetryExporter:
+    """
+    Forwards spans and counter updates to OpenTelemetry, so they reach whichever tracer and meter
+    providers the process has configured. Requires the opentelemetry-api package.
+
+    Spans are recorded when they end, so a span's children are exported before the span itself.
+    Children are held back until their parent arrives and are then started in its context, so the
+    OpenTelemetry trace keeps the span tree. Children whose parent never arrives are exported
+    without a parent once more than max_pending spans are waiting, and when the exporter is closed.
+
+    :param tracer_provider: An optional TracerProvider, defaults to the global one.
+    :param meter_provider: An optional MeterProvider, defaults to the global one.
+    :param max_pending: The maximum number of spans waiting for their parent.
+    """
+
+    def __init__(self, tracer_provider=None, meter_provider=None, max_pending=10000):
+        try:
+            from opentelemetry import metrics, trace
+        except ImportError as e:
+            raise ImportError("OpenTelemetryExporter requires the opentelemetry-api package.") from e
+        self.trace = trace
+        self.tracer = trace.get_tracer("quizify", tracer_provider=tracer_provider)
+        self.meter = metrics.get_meter("quizify", meter_provider=meter_provider)
+        self.instruments = {}
+        self.max_pending = max_pending
+        # Span records waiting for their parent, by the parent's span_id
+        self.pending = {}
+        self.pending_count = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _attributes(record):
+        # OpenTelemetry only accepts primitive attribute values
+        return {
+            key: value for key, value in record["attributes"].items()
+            if isinstance(value, (str, bool, int, float))
+        }
+
+    def export(self, record):
+        if record["type"] == "span":
+            with self.lock:
+                if record["parent_id"] is None:
+                    self._export_span(record)
+                    return
+                self.pending.setdefault(record["parent_id"], []).append(record)
+                self.pending_count += 1
+                if self.pending_count > self.max_pending:
+                    # The children of the parent waited for longest are given up on
+                    self._export_orphans(next(iter(self.pending)))
+            return
+
+        with self.lock:
+            instrument = self.instruments.get(record["name"])
+            if instrument is None:
+                instrument = self.instruments[record["name"]] = self.meter.create_counter(record["name"])
+        instrument.add(record["value"], self._attributes(record))
+
+    def _export_span(self, record, parent=None):
+        context = self.trace.set_span_in_context(parent) if parent is not None else None
+        start = int(record["start"] * 1e9)
+        span = self.tracer.start_span(
+            record["name"], context=context, start_time=start, attributes=self._attributes(record)
+        )
+        for child in self.pending.pop(record["span_id"], []):
+            self.pending_count -= 1
+            self._export_span(child, span)
+        span.end(end_time=start + int(record["duration_ms"] * 1e6))
+
+    def _export_orphans(self, parent_id):
+        for record in self.pending.pop(parent_id, []):
+            self.pending_count -= 1
+            self._export_span(record)
+
+    def close(self):
+        with self.lock:
+            while self.pending:
+                self._export_orphans(next(iter(self.pending)))
+
+
+# The process-wide instrumentation used by every pipeline stage
+instrumentation = Instrumentation()
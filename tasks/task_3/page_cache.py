@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from langchain_core.documents import Document
+
+class PageCache:
+    """
+    This class caches the pages extracted from PDF files, keyed by the SHA-256 of the file's bytes,
+    so that Streamlit reruns and repeat uploads of the same file skip parsing entirely.
+
+    Pages are stored as plain text and metadata rather than Document objects, and fresh Documents are
+    built on every hit, so callers can modify the returned pages without corrupting the cache. The
+    in-memory tier is bounded by the total size of the cached text and evicts the least recently used
+    files. An optional on-disk tier keeps one JSON file per PDF and evicts the least recently used
+    files once it exceeds its own size limit.
+
+    :param max_bytes: The maximum amount of page text kept in memory.
+    :param disk_directory: An optional directory for the on-disk tier.
+    :param max_disk_bytes: The maximum total size of the on-disk tier.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, disk_directory=None, max_disk_bytes=2 * 1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_directory = disk_directory
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = OrderedDict()  # file hash -> (pages, size in bytes)
+        self.size = 0
+        self.lock = threading.Lock()
+        if disk_directory:
+            os.makedirs(disk_directory, exist_ok=True)
+
+    @staticmethod
+    def _to_documents(pages, name):
+        return [
+            Document(page_content=content, metadata={**metadata, "source": name})
+            for content, metadata in pages
+        ]
+
+    def _disk_path(self, file_hash):
+        return os.path.join(self.disk_directory, f"{file_hash}.json")
+
+    def _remember(self, file_hash, pages):
+        size = sum(len(content) for content, _ in pages)
+        if size > self.max_bytes:
+            return
+        if file_hash in self.entries:
+            self.size -= self.entries.pop(file_hash)[1]
+        self.entries[file_hash] = (pages, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+
+    def get(self, file_hash, name):
+        """
+        Looks up the pages of a file, checking memory before disk.
+
+        :param file_hash: The SHA-256 of the file's bytes.
+        :param name: The file name, stored as the "source" metadata of the returned pages.
+        :return: A list of Documents, or None if the file is not cached.
+        """
+        with self.lock:
+            if file_hash in self.entries:
+                self.entries.move_to_end(file_hash)
+                return self._to_documents(self.entries[file_hash][0], name)
+
+            if not self.disk_directory:
+                return None
+            path = self._disk_path(file_hash)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    pages = [tuple(page) for page in json.load(f)]
+                os.utime(path)  # Mark as recently used for disk eviction
+            except (OSError, ValueError):
+                return None
+            self._remember(file_hash, pages)
+            return self._to_documents(pages, name)
+
+    def put(self, file_hash, documents):
+        """
+        Stores the pages of a file.
+
+        :param file_hash: The SHA-256 of the file's bytes.
+        :param documents: The file's pages as Documents.
+        """
+        pages = [
+            (document.page_content, {k: v for k, v in document.metadata.items() if k != "source"})
+            for document in documents
+        ]
+        with self.lock:
+            self._remember(file_hash, pages)
+            if self.disk_directory:
+                self._write_to_disk(file_hash, pages)
+
+    def _write_to_disk(self, file_hash, pages):
+        path = self._disk_path(file_hash)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(pages, f)
+        os.replace(temp_path, path)
+
+        files = []
+        for entry in os.scandir(self.disk_directory):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, evicted_path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(evicted_path)
+            total -= size
+
+    def clear(self):
+        """
+        Removes every entry from the in-memory tier.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+_shared_page_cache = None
+_shared_page_cache_lock = threading.Lock()
+
+def get_shared_page_cache(disk_directory=None):
+    """
+    Returns the process-wide page cache, creating it on first use.
+
+    The cache lives in this module rather than in the Streamlit script, so it survives script reruns
+    and is shared by every user session of the app.
+
+    :param disk_directory: An optional directory for the on-disk tier, used when the cache is first created.
+    :return: The shared PageCache.
+    """
+    global _shared_page_cache
+    with _shared_page_cache_lock:
+        if _shared_page_cache is None:
+            _shared_page_cache = PageCache(disk_directory=disk_directory)
+        return _shared_page_cache
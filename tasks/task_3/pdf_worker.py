@@ -0,0 +1,99 @@
+# Code that runs in the PDF parsing worker processes. It is kept apart from task_3_solution, so
+# the worker code itself only needs this module and pypdf.
+
+import io
+import multiprocessing
+from multiprocessing import shared_memory
+
+# The shared memory file and PdfReader a worker process last opened, keyed by shared memory block name
+_worker_reader = (None, None, None)
+
+
+class SharedMemoryFile(io.RawIOBase):
+    """
+    A read-only, seekable file over the first size bytes of a shared memory block.
+
+    Reads copy only the requested bytes, so a PDF can be parsed straight from shared memory without
+    every worker holding its own copy of the file. Closing the file detaches from the block.
+
+    :param shm: An attached SharedMemory block.
+    :param size: The length of the file in the block.
+    """
+
+    def __init__(self, shm, size):
+        super().__init__()
+        self.shm = shm
+        self.view = shm.buf[:size]
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = max(0, min(len(buffer), len(self.view) - self.position))
+        buffer[:count] = self.view[self.position:self.position + count]
+        self.position += count
+        return count
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: len(self.view)}[whence]
+        self.position = max(0, base + offset)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def close(self):
+        if not self.closed:
+            self.view.release()
+            self.shm.close()
+        super().close()
+
+
+def extract_page_range(shm_name, size, start, end):
+    """
+    Extracts the text of pages [start, end) from a PDF held in a shared memory block. Runs in a worker process.
+
+    Each worker attaches to the block once and reuses its reader for later ranges of the same file.
+    The reader reads the PDF from shared memory, so the bytes are never pickled, written to disk or
+    copied whole into the worker; only the parsed objects pypdf keeps take worker memory.
+
+    :return: A list of (page number, text) tuples.
+    """
+    global _worker_reader
+    name, file, reader = _worker_reader
+    if name != shm_name:
+        if file is not None:
+            reader = None
+            file.close()
+        from pypdf import PdfReader
+        file = io.BufferedReader(SharedMemoryFile(shared_memory.SharedMemory(name=shm_name), size))
+        reader = PdfReader(file)
+        _worker_reader = (shm_name, file, reader)
+    return [(page_number, reader.pages[page_number].extract_text()) for page_number in range(start, end)]
+
+
+def pool_context():
+    """
+    Returns the multiprocessing context for the PDF parsing pool.
+
+    Workers are never forked from the app process: forking the multi-threaded Streamlit server can
+    copy locks held by other threads, e.g. the SQLite caches', and deadlock the workers. Where it is
+    available, a forkserver is used, which is started once and forks workers from a single-threaded
+    process with this module and pypdf already imported. Elsewhere, e.g. on Windows, workers are spawned.
+
+    Both start methods also import the parent's main module, as multiprocessing always does. Under
+    Streamlit that is the app script, so the forkserver, or every spawned worker, loads the app's
+    imports, e.g. Streamlit and LangChain, though not the code under its `__main__` guard. The
+    forkserver pays for this once when it starts; workers forked from it do not import anything again.
+
+    :return: A multiprocessing context.
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__, "pypdf"])
+    return context
@@ -1,19 +1,36 @@
 # pdf_processing.py
 
 import streamlit as st
-from langchain.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import io
 import os
-import tempfile
-import uuid
+import hashlib
+from tasks.instrumentation import instrumentation
+from tasks.task_3.pdf_worker import extract_page_range, pool_context
 
 class DocumentProcessor:
     """
     This class encapsulates the functionality for processing uploaded PDF documents using Streamlit
-    and Langchain's PyPDFLoader. It provides a method to render a file uploader widget, process the
+    and pypdf, the parser behind Langchain's PyPDFLoader. It provides a method to render a file uploader widget, process the
     uploaded PDF files, extract their pages, and display the total number of pages extracted.
+
+    :param parallel: If True, files and page ranges of large files are parsed in a process pool.
+    :param max_workers: The number of worker processes used in parallel mode, defaults to the number of CPUs.
+    :param pages_per_task: The number of pages each worker task parses in parallel mode.
+    :param lazy: If True, ingest_documents() only records the uploads, and pages are parsed on demand by iter_pages().
+    :param page_cache: An optional PageCache; files whose hash is cached are not parsed again.
     """
-    def __init__(self):
+    def __init__(self, parallel=False, max_workers=None, pages_per_task=16, lazy=False, page_cache=None):
         self.pages = []  # List to keep track of pages from all documents
+        self.file_hashes = []  # SHA-256 of each uploaded file, in upload order
+        self.uploaded_files = []  # Uploads waiting to be parsed by iter_pages() in lazy mode
+        self.lazy = lazy
+        self.page_cache = page_cache
+        self.parallel = parallel
+        self.max_workers = max_workers
+        self.pages_per_task = pages_per_task
     
     def ingest_documents(self):
         """
@@ -23,37 +40,188 @@ class DocumentProcessor:
         Steps:
         1. Utilize the Streamlit file uploader widget to allow users to upload PDF files.
         2. For each uploaded PDF file:
-           a. Generate a unique identifier and append it to the original file name before saving it temporarily.
-           b. Use Langchain's PyPDFLoader on the path of the temporary file to extract pages.
-           c. Clean up by deleting the temporary file after processing.
+           a. Hash the file's bytes so its pages can be traced back to the upload.
+           b. Parse the pages straight from the in-memory buffer, without a temporary file.
         3. Keep track of the total number of pages extracted from all uploaded documents.
         """
         
-        # Render a file uploader widget.
-        uploaded_files = st.file_uploader("Upload a PDF file", type="pdf", accept_multiple_files=True)
+        with instrumentation.span("ingest_documents", lazy=self.lazy) as span:
+            # Render a file uploader widget.
+            uploaded_files = st.file_uploader("Upload a PDF file", type="pdf", accept_multiple_files=True)
         
-        if uploaded_files is not None:
+            if uploaded_files is not None:
+                span.set(files=len(uploaded_files))
+                if self.lazy:
+                    self.uploaded_files = list(uploaded_files)
+                    self.file_hashes = [hashlib.sha256(f.getvalue()).hexdigest() for f in uploaded_files]
+                else:
+                    self.process_files(uploaded_files)
+            
+                # Display the total number of pages processed
+                #st.write(f"Total pages processed: {len(self.pages)}") NOTE: This line is commented out because it is not necessary to display the total number of pages extracted from all uploaded documents.
+
+    def process_files(self, uploaded_files):
+        """
+        Extracts the pages of uploaded PDF files and appends them to self.pages in upload order.
+
+        The files are parsed straight from their in-memory buffers; nothing is written to disk.
+
+        :param uploaded_files: A list of uploaded files, each with a name and a getvalue() method returning the file's bytes.
+        """
+        with instrumentation.span("process_files", files=len(uploaded_files)) as span:
+            buffers = []
             for uploaded_file in uploaded_files:
-                # Generate a unique identifier to append to the file's original name
-                unique_id = uuid.uuid4().hex
-                original_name, file_extension = os.path.splitext(uploaded_file.name)
-                temp_file_name = f"{original_name}_{unique_id}{file_extension}"
-                temp_file_path = os.path.join(tempfile.gettempdir(), temp_file_name)
-
-                # Write the uploaded PDF to a temporary file
-                with open(temp_file_path, 'wb') as f:
-                    f.write(uploaded_file.getvalue())
-
-                # Process the temporary file
-                loader = PyPDFLoader(temp_file_path)
-                pages = loader.load_and_split()
+                data = uploaded_file.getvalue()
+
+                # Fingerprint the file so its pages can be traced back to the exact upload
+                file_hash = hashlib.sha256(data).hexdigest()
+                self.file_hashes.append(file_hash)
+                buffers.append((uploaded_file.name, data, file_hash))
+
+            # Files seen before, on an earlier rerun or in another upload, are served from the cache
+            file_pages = [None] * len(buffers)
+            if self.page_cache is not None:
+                for index, (name, _, file_hash) in enumerate(buffers):
+                    file_pages[index] = self.page_cache.get(file_hash, name)
+            misses = [index for index, pages in enumerate(file_pages) if pages is None]
+            if self.page_cache is not None:
+                instrumentation.count("page_cache.hits", len(buffers) - len(misses))
+                instrumentation.count("page_cache.misses", len(misses))
+
+            miss_buffers = [buffers[index] for index in misses]
+            if self.parallel:
+                parsed = self._load_parallel(miss_buffers) if miss_buffers else []
+            else:
+                parsed = [self.load_pdf(name, data) for name, data, _ in miss_buffers]
+
+            for index, pages in zip(misses, parsed):
+                file_pages[index] = pages
+                if self.page_cache is not None:
+                    self.page_cache.put(buffers[index][2], pages)
+
+            for (_, _, file_hash), pages in zip(buffers, file_pages):
+                for page in pages:
+                    page.metadata["file_hash"] = file_hash
                 self.pages.extend(pages)
-                
-                # Clean up by deleting the temporary file
-                os.unlink(temp_file_path)
-            
-            # Display the total number of pages processed
-            #st.write(f"Total pages processed: {len(self.pages)}") NOTE: This line is commented out because it is not necessary to display the total number of pages extracted from all uploaded documents.
+
+            span.set(
+                bytes=sum(len(data) for _, data, _ in buffers),
+                pages=sum(len(pages) for pages in file_pages),
+                parsed_files=len(misses)
+            )
+
+    @staticmethod
+    def iter_pdf(name, data):
+        """
+        Parses a PDF from memory one page at a time.
+
+        The result matches PyPDFLoader.load_and_split(): one Document per page with "source" and "page"
+        metadata, split with the default RecursiveCharacterTextSplitter.
+
+        :param name: The file name, stored as the "source" metadata.
+        :param data: The PDF file's bytes.
+        :return: A generator of the split pages.
+        """
+        # The parser and splitter are only imported once a PDF is parsed, to keep app start-up fast
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        from pypdf import PdfReader
+
+        text_splitter = RecursiveCharacterTextSplitter()
+        reader = PdfReader(io.BytesIO(data))
+        for page_number, page in enumerate(reader.pages):
+            document = Document(page_content=page.extract_text(), metadata={"source": name, "page": page_number})
+            yield from text_splitter.split_documents([document])
+
+    @classmethod
+    def load_pdf(cls, name, data):
+        """
+        Parses a PDF from memory.
+
+        :param name: The file name, stored as the "source" metadata.
+        :param data: The PDF file's bytes.
+        :return: A list of the split pages.
+        """
+        return list(cls.iter_pdf(name, data))
+
+    def iter_pages(self):
+        """
+        Lazily parses the uploads recorded in lazy mode, yielding pages one at a time in upload order.
+
+        Pages are not kept in self.pages, so memory use does not grow with the size of the upload.
+        With a page cache, the text of each file being parsed is collected so it can be cached once
+        the file is complete, so memory use then grows with the size of the largest file.
+
+        :return: A generator of the split pages, tagged with their file hash.
+        """
+        for uploaded_file, file_hash in zip(self.uploaded_files, self.file_hashes):
+            cached = self.page_cache.get(file_hash, uploaded_file.name) if self.page_cache is not None else None
+            if cached is not None:
+                for page in cached:
+                    page.metadata["file_hash"] = file_hash
+                    yield page
+                continue
+
+            parsed = []
+            for page in self.iter_pdf(uploaded_file.name, uploaded_file.getvalue()):
+                if self.page_cache is not None:
+                    parsed.append(Document(page_content=page.page_content, metadata=dict(page.metadata)))
+                page.metadata["file_hash"] = file_hash
+                yield page
+            if self.page_cache is not None:
+                self.page_cache.put(file_hash, parsed)
+
+    def _load_parallel(self, buffers):
+        """
+        Parses PDF files in a process pool, splitting large files into page ranges.
+
+        Each file is placed in a shared memory block once, and the workers read it from there.
+        Pages are returned in document and page order, in the same form as load_pdf().
+
+        :param buffers: A list of (name, bytes, file hash) tuples.
+        :return: A list with the split pages of each file.
+        """
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        from pypdf import PdfReader
+
+        tasks = []
+        for file_index, (_, data, _) in enumerate(buffers):
+            page_count = len(PdfReader(io.BytesIO(data)).pages)
+            for start in range(0, page_count, self.pages_per_task):
+                tasks.append((file_index, start, min(start + self.pages_per_task, page_count)))
+
+        workers = self.max_workers or os.cpu_count() or 1
+        if workers <= 1 or len(tasks) <= 1:
+            # A pool would only add process start-up overhead
+            return [self.load_pdf(name, data) for name, data, _ in buffers]
+
+        blocks = []
+        try:
+            for _, data, _ in buffers:
+                shm = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+                shm.buf[:len(data)] = data
+                blocks.append(shm)
+
+            with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as executor:
+                futures = [
+                    executor.submit(extract_page_range, blocks[file_index].name, len(buffers[file_index][1]), start, end)
+                    for file_index, start, end in tasks
+                ]
+                # Collect the results in submission order to keep documents and pages in order
+                results = [future.result() for future in futures]
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+        file_pages = [[] for _ in buffers]
+        for (file_index, _, _), result in zip(tasks, results):
+            for page_number, text in result:
+                file_pages[file_index].append(
+                    Document(page_content=text, metadata={"source": buffers[file_index][0], "page": page_number})
+                )
+
+        text_splitter = RecursiveCharacterTextSplitter()
+        return [text_splitter.split_documents(pages) for pages in file_pages]
         
 if __name__ == "__main__":
     processor = DocumentProcessor()
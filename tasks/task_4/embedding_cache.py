@@ -0,0 +1,131 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+class EmbeddingCache:
+    """
+    This class caches embedding vectors on disk, keyed by a hash of the model name, the embedding task
+    and the text, so the same text is only ever sent to the embedding model once.
+
+    Vectors are stored as float32 blobs in a SQLite database. Recently used vectors are also kept in
+    an in-memory LRU tier as float32 arrays, about 3 KB per 768-dimensional vector, so repeated
+    lookups within a process do not touch the disk. When the
+    database grows beyond max_disk_entries, the least recently used rows are evicted.
+
+    :param path: The path of the SQLite database file. It is created if it does not exist.
+    :param max_memory_entries: The maximum number of vectors kept in the in-memory LRU tier.
+    :param max_disk_entries: The maximum number of vectors kept in the database.
+    """
+
+    def __init__(self, path, max_memory_entries=10000, max_disk_entries=500000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)"
+        )
+        self.connection.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model_name, task, text):
+        """
+        Builds the content-addressed cache key for a text.
+
+        :param model_name: The name of the embedding model.
+        :param task: The kind of embedding, e.g. "document" or "query".
+        :param text: The embedded text.
+        :return: A hex SHA-256 digest.
+        """
+        return hashlib.sha256(f"{model_name}\0{task}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key, vector):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+
+    def get_many(self, keys):
+        """
+        Looks up several keys, checking the memory tier before the database.
+
+        :param keys: A list of cache keys.
+        :return: A dictionary of the keys that were found, mapped to their vectors.
+        """
+        found = {}
+        with self.lock:
+            missing = []
+            for key in keys:
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[key] = self.memory[key].tolist()
+                else:
+                    missing.append(key)
+
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+                    self._remember(key, vector)
+                if rows:
+                    now = time.time()
+                    self.connection.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, key) for key, _ in rows]
+                    )
+            self.connection.commit()
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """
+        Stores several vectors and evicts the least recently used rows if the database is full.
+
+        :param items: A dictionary of cache keys mapped to their vectors.
+        """
+        if not items:
+            return
+        now = time.time()
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items.items()]
+            )
+            for key, vector in items.items():
+                self._remember(key, array("f", vector))
+
+            count = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_disk_entries:
+                self.connection.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+                    (count - self.max_disk_entries,)
+                )
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -1,7 +1,23 @@
 # embedding_client.py
 
-from langchain_google_vertexai import VertexAIEmbeddings
-from google.oauth2 import service_account
+import sys
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+sys.path.append(os.path.abspath('../../'))
+from tasks.task_4.embedding_cache import EmbeddingCache
+from tasks.instrumentation import instrumentation
+
+@lru_cache(maxsize=None)
+def load_credentials(path):
+    """
+    Loads service-account credentials once per path; the credentials object refreshes its own tokens.
+    """
+    from google.oauth2 import service_account
+    return service_account.Credentials.from_service_account_file(path)
+
+DEFAULT_CREDENTIALS_PATH = 'D:\\Radical AI test\\mission-quizify\\Authentication.json'
 
 class EmbeddingClient:
     """
@@ -20,19 +36,54 @@ class EmbeddingClient:
     - model_name: A string representing the name of the model to use for embeddings.
     - project: The Google Cloud project ID where the embedding model is hosted.
     - location: The location of the Google Cloud project, such as 'us-central1'.
+    - cache_path: An optional path to an on-disk embedding cache. When set, only texts that are not
+      in the cache are sent to Vertex AI.
+    - max_concurrency: The maximum number of embedding requests sent to Vertex AI at the same time.
+    - credentials_path: The service-account key file. Defaults to the GOOGLE_APPLICATION_CREDENTIALS
+      environment variable, then to DEFAULT_CREDENTIALS_PATH.
+    - client: An optional embeddings object with embed_query and embed_documents methods, used instead
+      of VertexAIEmbeddings, e.g. a local stand-in for offline benchmarks. No credentials are loaded.
     """
+
+    # Per-request limits of the Vertex AI text embedding models
+    MAX_BATCH_SIZE = 250
+    MAX_BATCH_TOKENS = 20000
     
-    def __init__(self, model_name, project, location):
-        # Initialize the VertexAIEmbeddings client with the given parameters
-        credentials = service_account.Credentials.from_service_account_file(
-            'D:\\Radical AI test\\mission-quizify\\Authentication.json'
-        )
-        self.client = VertexAIEmbeddings(
-            model_name=model_name,
-            project=project,
-            location=location,
-            credentials=credentials
-        )
+    def __init__(self, model_name, project, location, cache_path=None, max_concurrency=4,
+                 credentials_path=None, client=None):
+        self._client = client
+        self.client_injected = client is not None
+        self._client_lock = threading.Lock()
+        self.credentials_path = credentials_path
+        self.project = project
+        self.location = location
+        self.model_name = model_name
+        self.cache = EmbeddingCache(cache_path) if cache_path else None
+        self.max_concurrency = max_concurrency
+
+    @property
+    def client(self):
+        """
+        The embeddings client. The VertexAIEmbeddings client is created on first use, so importing
+        the Vertex AI SDK and loading credentials is deferred until something is embedded.
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from langchain_google_vertexai import VertexAIEmbeddings
+
+                    # Initialize the VertexAIEmbeddings client with the given parameters
+                    credentials = load_credentials(
+                        self.credentials_path
+                        or os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", DEFAULT_CREDENTIALS_PATH)
+                    )
+                    self._client = VertexAIEmbeddings(
+                        model_name=self.model_name,
+                        project=self.project,
+                        location=self.location,
+                        credentials=credentials
+                    )
+        return self._client
         
     def embed_query(self, query):
         """
@@ -41,8 +92,27 @@ class EmbeddingClient:
         :param query: The text query to embed.
         :return: The embeddings for the query or None if the operation fails.
         """
-        vectors = self.client.embed_query(query)
+        if self.cache is None:
+            return self._embed_query(query)
+
+        key = EmbeddingCache.make_key(self.model_name, "query", query)
+        cached = self.cache.get_many([key])
+        instrumentation.count("embedding.cache_hits", len(cached))
+        if key in cached:
+            return cached[key]
+        instrumentation.count("embedding.cache_misses")
+
+        vectors = self._embed_query(query)
+        if vectors:
+            self.cache.put_many({key: vectors})
         return vectors
+
+    def _embed_query(self, query):
+        tokens = self.estimate_tokens(query)
+        with instrumentation.span("embed_query", tokens=tokens):
+            instrumentation.count("embedding.calls")
+            instrumentation.count("embedding.tokens", tokens)
+            return self.client.embed_query(query)
     
     def embed_documents(self, documents):
         """
@@ -51,11 +121,105 @@ class EmbeddingClient:
         :param documents: A list of text documents to embed.
         :return: A list of embeddings for the given documents.
         """
-        try:
-            return self.client.embed_documents(documents)
-        except AttributeError:
-            print("Method embed_documents not defined for the client.")
-            return None
+        if self.cache is None:
+            return self._embed_documents(documents)
+
+        keys = [EmbeddingCache.make_key(self.model_name, "document", document) for document in documents]
+        cached = self.cache.get_many(keys)
+        instrumentation.count("embedding.cache_hits", len(cached))
+        instrumentation.count("embedding.cache_misses", len(keys) - len(cached))
+
+        # Only embed each missing text once, even if it appears several times in the batch
+        missing = {}
+        for key, document in zip(keys, documents):
+            if key not in cached and key not in missing:
+                missing[key] = document
+
+        if missing:
+            vectors = self._embed_documents(list(missing.values()))
+            if vectors is None:
+                return None
+            new_vectors = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(new_vectors)
+            cached.update(new_vectors)
+
+        return [cached[key] for key in keys]
+
+    @staticmethod
+    def estimate_tokens(text):
+        """
+        Estimates the token count of a text conservatively, at three characters per token.
+        """
+        return len(text) // 3 + 1
+
+    def pack_batches(self, documents):
+        """
+        Packs documents into request-sized batches that respect the model's instance and token limits.
+
+        :param documents: A list of text documents.
+        :return: A list of batches, each a list of indices into documents, in the original order.
+        """
+        batches = []
+        current, current_tokens = [], 0
+        for index, document in enumerate(documents):
+            tokens = self.estimate_tokens(document)
+            if current and (len(current) >= self.MAX_BATCH_SIZE or current_tokens + tokens > self.MAX_BATCH_TOKENS):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(index)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _embed_batch(self, batch):
+        if self.client_injected:
+            return self.client.embed_documents(batch)
+        # VertexAIEmbeddings would split the batch again into its own smaller batches
+        return self.client.embed_documents(batch, batch_size=len(batch))
+
+    def _embed_documents(self, documents):
+        """
+        Embeds documents in request-sized batches, sending up to max_concurrency batches at once.
+
+        :return: A list of embeddings in the same order as documents, or None if the client cannot embed documents.
+        """
+        batches = [[documents[index] for index in batch] for batch in self.pack_batches(documents)]
+        tokens = sum(self.estimate_tokens(document) for document in documents) if instrumentation.enabled else 0
+        with instrumentation.span("embed_documents", texts=len(documents), batches=len(batches), tokens=tokens):
+            instrumentation.count("embedding.calls", len(batches))
+            instrumentation.count("embedding.tokens", tokens)
+            try:
+                if len(batches) <= 1 or self.max_concurrency <= 1:
+                    results = [self._embed_batch(batch) for batch in batches]
+                else:
+                    with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+                        results = list(executor.map(self._embed_batch, batches))
+            except AttributeError:
+                print("Method embed_documents not defined for the client.")
+                return None
+
+        # Batches hold consecutive documents, so concatenating them restores the original order
+        return [vector for result in results for vector in result]
+
+_client_pool = {}
+_client_pool_lock = threading.Lock()
+
+def get_embedding_client(**config):
+    """
+    Returns the process-wide EmbeddingClient for a configuration, creating it on first use.
+
+    Streamlit reruns the app script on every interaction and serves all user sessions from one process,
+    so sharing clients avoids reloading credentials and reconnecting to Vertex AI each time.
+
+    :param config: The keyword arguments for EmbeddingClient.
+    :return: A shared EmbeddingClient.
+    """
+    key = tuple(sorted(config.items()))
+    with _client_pool_lock:
+        if key not in _client_pool:
+            _client_pool[key] = EmbeddingClient(**config)
+        return _client_pool[key]
 
 if __name__ == "__main__":
     model_name = "textembedding-gecko@003"
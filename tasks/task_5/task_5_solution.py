@@ -1,17 +1,16 @@
 import sys
 import os
-from annotated_types import doc
-from posthog import page
+import json
+import hashlib
+import uuid
 import streamlit as st
 sys.path.append(os.path.abspath('../../'))
 from tasks.task_3.task_3_solution import DocumentProcessor
 from tasks.task_4.task_4_solution import EmbeddingClient
+from tasks.instrumentation import instrumentation
 
 # Import Task libraries
 from langchain_core.documents import Document
-from langchain.text_splitter import CharacterTextSplitter
-from langchain.vectorstores import Chroma
-from google.cloud import aiplatform
 
 class ChromaCollectionCreator:
     """
@@ -20,53 +19,293 @@ class ChromaCollectionCreator:
 
     Steps:
     1. Check if any documents have been processed by the DocumentProcessor instance. If not, display an error message using Streamlit's error widget.
-    2. Split the processed documents into text chunks suitable for embedding and indexing using the CharacterTextSplitter from Langchain.
+    2. Split the processed documents into text chunks suitable for embedding and indexing, with the splitter chosen by splitter_settings.
     3. Create a Chroma collection in memory with the text chunks and the embeddings model initialized in the class.
+
+    If a persist_directory is given, the collection is stored on disk under a name derived from a fingerprint of
+    the uploaded files, the splitter settings and the embedding model, and is reopened instead of rebuilt when
+    the same files are submitted again.
     """
 
-    def __init__(self, processor, embed_model):
+    # Splitting methods: "recursive_tokens" splits at paragraph, sentence, line and word boundaries with
+    # RecursiveTokenSplitter, and "character" splits on a single separator with LangChain's CharacterTextSplitter
+    SPLITTER_METHODS = ("recursive_tokens", "character")
+
+    # Collection metadata key holding the chunk count, written once a persisted collection is fully built
+    COMPLETE_KEY = "quizify_chunks"
+
+    def __init__(self, processor, embed_model, persist_directory=None, splitter_settings=None):
         """
         Initializes the ChromaCollectionCreator with a DocumentProcessor instance and embeddings configuration.
         
         :param processor: An instance of DocumentProcessor that has processed documents.
         :param embed_model: An embedding client for embedding documents.
+        :param persist_directory: An optional directory where Chroma collections are persisted between runs.
+        :param splitter_settings: Optional overrides of the default splitter settings:
+            - method: One of SPLITTER_METHODS.
+            - length: "tokens" to measure chunks with the embedding model's token estimate, or "characters".
+              The character method always measures characters.
+            - chunk_size, chunk_overlap: The maximum chunk length and overlap, in the unit given by length.
+            - adaptive_overlap: If True, the recursive splitter only adds overlap where a chunk ends inside a paragraph.
+            - separator: The separator of the character method.
         """
         self.processor = processor  # Holds the DocumentProcessor from Task 3
         self.embed_model = embed_model  # Holds the EmbeddingClient from Task 4
+        self.persist_directory = persist_directory
+        self.splitter_settings = {
+            "method": "recursive_tokens",
+            "length": "tokens",
+            "chunk_size": 320,
+            "chunk_overlap": 64,
+            "adaptive_overlap": True,
+        }
+        if splitter_settings:
+            self.splitter_settings.update(splitter_settings)
+        if self.splitter_settings["method"] not in self.SPLITTER_METHODS:
+            raise ValueError(f"Unknown splitter method: {self.splitter_settings['method']}")
         self.db = None  # Holds the Chroma collection
 
+    def fingerprint(self) -> str:
+        """
+        Computes a content hash of the uploaded files, the splitter settings and the embedding model.
+
+        :return: A hex SHA-256 digest identifying the collection these inputs produce.
+        """
+        key = {
+            "files": sorted(self.processor.file_hashes),
+            "splitter": self.splitter_settings,
+            "model": getattr(self.embed_model, "model_name", None),
+        }
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def collection_name(self) -> str:
+        """
+        Returns the persistent collection name for the current inputs.
+        """
+        return f"quizify-{self.fingerprint()[:32]}"
+
+    def split_documents(self, pages) -> list:
+        """
+        Splits pages into text chunks using the configured splitter settings.
+
+        :param pages: A list of Documents.
+        :return: A list of chunk Documents.
+        """
+        settings = self.splitter_settings
+        if settings["method"] == "character":
+            from langchain_text_splitters import CharacterTextSplitter
+
+            text_splitter = CharacterTextSplitter(
+                separator=settings.get("separator", "\n"),
+                chunk_size=settings["chunk_size"],
+                chunk_overlap=settings["chunk_overlap"],
+                length_function=len,
+                is_separator_regex=False,
+            )
+        else:
+            from tasks.task_5.text_splitter import RecursiveTokenSplitter
+
+            text_splitter = RecursiveTokenSplitter(
+                chunk_size=settings["chunk_size"],
+                chunk_overlap=settings["chunk_overlap"],
+                length_function=self.token_length_function() if settings.get("length") == "tokens" else len,
+                adaptive_overlap=settings.get("adaptive_overlap", True),
+            )
+        return text_splitter.split_documents(pages)
+
+    def token_length_function(self):
+        """
+        Returns the embedding model's token estimate, the same one it uses to pack requests within the
+        Vertex AI token limit, falling back to EmbeddingClient's estimate for other embedding models.
+        """
+        return getattr(self.embed_model, "estimate_tokens", EmbeddingClient.estimate_tokens)
+
+    @staticmethod
+    def chunk_id(chunk) -> str:
+        """
+        Computes the content-addressed ID of a chunk from its source file hash and its text.
+
+        :param chunk: A chunk Document.
+        :return: A hex SHA-256 digest.
+        """
+        file_hash = chunk.metadata.get("file_hash", "")
+        return hashlib.sha256(f"{file_hash}\0{chunk.page_content}".encode("utf-8")).hexdigest()
+
     def create_chroma_collection(self):
         """
         Creates a Chroma collection from the documents processed by the DocumentProcessor instance.
         """
+        from langchain_community.vectorstores import Chroma
+
+        with instrumentation.span("create_chroma_collection", pages=len(self.processor.pages)) as span:
+            # Step 1: Check for processed documents
+            if len(self.processor.pages) == 0:
+                st.error("No documents found!", icon="🚨")
+                return
+
+            # Reopen a persisted collection built from the same files and settings
+            if self._open_persisted_collection():
+                span.set(reopened=True)
+                st.success("Loaded existing Chroma Collection!", icon="✅")
+                return
+
+            # Step 2: Split documents into text chunks
+            with instrumentation.span("split_documents"):
+                texts = self.split_documents(self.processor.pages)
+            span.set(reopened=False, chunks=len(texts))
+
+            if texts:
+                st.success(f"Successfully split documents to {len(texts)} pages!", icon="✅")
+            else:
+                st.error("Failed to split documents.", icon="🚨")
+                return
+
+            # Step 3: Create the Chroma Collection
+            with instrumentation.span("chroma_insert", chunks=len(texts)):
+                if self.persist_directory:
+                    self.db = Chroma.from_documents(
+                        texts,
+                        self.embed_model,
+                        collection_name=self.collection_name(),
+                        persist_directory=self.persist_directory,
+                    )
+                    self._mark_complete(len(texts))
+                else:
+                    self.db = Chroma.from_documents(texts, self.embed_model)
+            if self.db:
+                st.success("Successfully created Chroma Collection!", icon="✅")
+            else:
+                st.error("Failed to create Chroma Collection!", icon="🚨")
+
+    def _open_persisted_collection(self) -> bool:
+        """
+        Opens the persisted collection for the current fingerprint if it was completely built.
 
-        # Step 1: Check for processed documents
-        if len(self.processor.pages) == 0:
+        A collection is complete once its metadata records a chunk count that matches its contents.
+        A collection left behind by an interrupted build, e.g. by a Streamlit rerun or an embedding
+        error, is deleted so it is rebuilt from scratch.
+
+        :return: True if an existing collection was opened into self.db, False otherwise.
+        """
+        from langchain_community.vectorstores import Chroma
+
+        if not self.persist_directory:
+            return False
+        db = Chroma(
+            collection_name=self.collection_name(),
+            embedding_function=self.embed_model,
+            persist_directory=self.persist_directory,
+        )
+        count = db._collection.count()
+        if count and (db._collection.metadata or {}).get(self.COMPLETE_KEY) == count:
+            self.db = db
+            return True
+        if count:
+            print(f"Discarding incomplete Chroma collection with {count} chunks.")
+            db.delete_collection()
+        return False
+
+    def _mark_complete(self, count):
+        """
+        Records in the persisted collection's metadata that it holds all count chunks.
+        """
+        metadata = dict(self.db._collection.metadata or {})
+        metadata[self.COMPLETE_KEY] = count
+        self.db._collection.modify(metadata=metadata)
+
+    def stream_chroma_collection(self, batch_size=64, on_batch=None):
+        """
+        Builds the Chroma collection by streaming pages from the DocumentProcessor in lazy mode.
+
+        Pages are parsed, split, embedded and inserted one batch at a time, so peak memory is bounded
+        by the batch size rather than the corpus size. If the DocumentProcessor has a page cache, the
+        text of the file being parsed is also held until the file is complete, so memory then grows
+        with the size of the largest file. self.db is set before the first batch, so the collection
+        can be queried while later pages are still being parsed. A persisted collection is only
+        reopened by later calls once every batch has been inserted.
+
+        :param batch_size: The number of chunks embedded and inserted per batch.
+        :param on_batch: An optional callback called with the running chunk count after each batch.
+        :return: The number of chunks inserted.
+        """
+        from langchain_community.vectorstores import Chroma
+
+        if not self.processor.uploaded_files:
             st.error("No documents found!", icon="🚨")
-            return
-
-        # Step 2: Split documents into text chunks
-        text_splitter = CharacterTextSplitter(
-            separator="\n",
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            is_separator_regex=False,
+            return 0
+
+        if self._open_persisted_collection():
+            st.success("Loaded existing Chroma Collection!", icon="✅")
+            return 0
+
+        self.db = Chroma(
+            collection_name=self.collection_name() if self.persist_directory else f"quizify-{uuid.uuid4().hex}",
+            embedding_function=self.embed_model,
+            persist_directory=self.persist_directory,
         )
-        texts = text_splitter.split_documents(self.processor.pages)
 
-        if texts:
-            st.success(f"Successfully split documents to {len(texts)} pages!", icon="✅")
-        else:
-            st.error("Failed to split documents.", icon="🚨")
-            return
+        count = 0
+        batch = []
+        for page in self.processor.iter_pages():
+            batch.extend(self.split_documents([page]))
+            while len(batch) >= batch_size:
+                self.db.add_documents(batch[:batch_size])
+                count += batch_size
+                batch = batch[batch_size:]
+                if on_batch:
+                    on_batch(count)
+        if batch:
+            self.db.add_documents(batch)
+            count += len(batch)
+            if on_batch:
+                on_batch(count)
+        if self.persist_directory:
+            self._mark_complete(count)
 
-        # Step 3: Create the Chroma Collection
-        self.db = Chroma.from_documents(texts, self.embed_model)
-        if self.db:
-            st.success("Successfully created Chroma Collection!", icon="✅")
-        else:
-            st.error("Failed to create Chroma Collection!", icon="🚨")
+        st.success(f"Successfully streamed {count} chunks into Chroma Collection!", icon="✅")
+        return count
+
+    def update_chroma_collection(self, collection_name="quizify-corpus", batch_size=1000):
+        """
+        Brings a long-lived Chroma collection in line with the currently uploaded documents.
+
+        Every chunk is stored under its content hash, so the current upload set can be diffed against
+        the collection: only chunks that are not stored yet are embedded and added, and chunks that
+        no longer belong to any uploaded document are deleted. Adding one PDF to a large corpus
+        therefore only embeds that PDF.
+
+        :param collection_name: The name of the collection to update. It is created if it does not exist,
+            and it becomes the creator's collection even if another one was open before.
+        :param batch_size: The maximum number of chunks added to Chroma per call.
+        :return: A tuple of the number of chunks added and deleted.
+        """
+        from langchain_community.vectorstores import Chroma
+
+        # The open collection may be another one, e.g. the fingerprint collection of create_chroma_collection
+        self.db = Chroma(
+            collection_name=collection_name,
+            embedding_function=self.embed_model,
+            persist_directory=self.persist_directory,
+        )
+
+        # Chunks with identical content in the same file share an ID, so keep only the first
+        chunks = {}
+        for chunk in self.split_documents(self.processor.pages):
+            chunks.setdefault(self.chunk_id(chunk), chunk)
+
+        existing_ids = set(self.db.get(include=[])["ids"])
+
+        new_ids = [chunk_id for chunk_id in chunks if chunk_id not in existing_ids]
+        for start in range(0, len(new_ids), batch_size):
+            ids = new_ids[start:start + batch_size]
+            self.db.add_documents([chunks[chunk_id] for chunk_id in ids], ids=ids)
+
+        stale_ids = [chunk_id for chunk_id in existing_ids if chunk_id not in chunks]
+        for start in range(0, len(stale_ids), batch_size):
+            self.db.delete(ids=stale_ids[start:start + batch_size])
+
+        st.success(f"Updated Chroma Collection: {len(new_ids)} chunks added, {len(stale_ids)} removed.", icon="✅")
+        return len(new_ids), len(stale_ids)
 
     def query_chroma_collection(self, query) -> Document:
         """
@@ -75,23 +314,26 @@ class ChromaCollectionCreator:
         :param query: The query string to search for in the Chroma collection.
         :return: The first matching document from the collection with similarity score.
         """
-        if self.db:
-            docs = self.db.similarity_search_with_relevance_scores(query)
-            if docs:
-                return docs[0]
+        with instrumentation.span("query_chroma_collection") as span:
+            if self.db:
+                docs = self.db.similarity_search_with_relevance_scores(query)
+                span.set(results=len(docs))
+                if docs:
+                    return docs[0]
+                else:
+                    st.error("No matching documents found!", icon="🚨")
             else:
-                st.error("No matching documents found!", icon="🚨")
-        else:
-            st.error("Chroma Collection has not been created!", icon="🚨")
+                st.error("Chroma Collection has not been created!", icon="🚨")
 
-    def as_retriever(self):
+    def as_retriever(self, **kwargs):
         """
         Converts the ChromaCollectionCreator into a retriever.
         
+        :param kwargs: Optional retriever settings forwarded to Chroma, e.g. search_kwargs={"k": 10}.
         :return: A retriever object from the Chroma collection.
         """
         if self.db:
-            return self.db.as_retriever()
+            return self.db.as_retriever(**kwargs)
         else:
             raise AttributeError("Chroma Collection has not been created!")
 
@@ -0,0 +1,114 @@
+import re
+
+from langchain_text_splitters import TextSplitter
+
+class RecursiveTokenSplitter(TextSplitter):
+    """
+    This class splits text into chunks of at most chunk_size, measured with length_function, at the
+    most natural boundary available.
+
+    Text is split into paragraphs first. Paragraphs that are too long are split into sentences,
+    sentences into lines, lines into words, and words that are still too long are cut. The pieces
+    are then merged greedily into chunks. Passing the embedding model's token count as
+    length_function keeps chunk sizes in the unit the model is limited and billed by.
+
+    With adaptive_overlap, a chunk that ends at a paragraph break has no overlap with the next chunk,
+    since nothing was cut off. A chunk that ends inside a paragraph repeats its trailing sentences, up
+    to chunk_overlap in total, at the start of the next chunk, without reaching back past a paragraph
+    break. Without adaptive_overlap, every chunk repeats up to chunk_overlap of the previous chunk.
+
+    :param chunk_size: The maximum length of a chunk.
+    :param chunk_overlap: The maximum length of the text repeated from the previous chunk.
+    :param length_function: A function that returns the length of a text, e.g. its token count.
+    :param adaptive_overlap: If True, overlap is only added where a chunk ends inside a paragraph.
+    :param kwargs: Further keyword arguments for LangChain's TextSplitter, e.g. add_start_index.
+    """
+
+    # Boundaries from the strongest to the weakest: paragraphs, sentences, lines and words
+    SEPARATORS = [r"\n[ \t]*\n\s*", r"(?<=[.!?])\s+", r"\s*\n\s*", r"\s+"]
+    PARAGRAPH = 0
+
+    def __init__(self, chunk_size=320, chunk_overlap=64, length_function=len, adaptive_overlap=True, **kwargs):
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=length_function, **kwargs)
+        self.adaptive_overlap = adaptive_overlap
+
+    def split_text(self, text) -> list:
+        """
+        Splits a text into chunks.
+
+        :param text: The text to split.
+        :return: A list of chunk strings.
+        """
+        pieces = self._split(text, 0)
+        if not pieces:
+            return []
+        pieces[-1][2] = self.PARAGRAPH  # The end of the text ends every paragraph
+        return self._merge(pieces)
+
+    def _split(self, text, level) -> list:
+        # Each piece is [text followed by its separator, length of the text, level of the separator]
+        if level == len(self.SEPARATORS):
+            return self._cut(text)
+
+        parts = re.split(f"({self.SEPARATORS[level]})", text)
+        pieces = []
+        for index in range(0, len(parts), 2):
+            part = parts[index]
+            separator = parts[index + 1] if index + 1 < len(parts) else ""
+            if not part.strip():
+                continue
+            length = self._length_function(part)
+            if length <= self._chunk_size:
+                pieces.append([part + separator, length, level])
+            else:
+                smaller = self._split(part, level + 1)
+                smaller[-1][0] += separator
+                smaller[-1][2] = level
+                pieces.extend(smaller)
+        return pieces
+
+    def _cut(self, text) -> list:
+        pieces = []
+        while text:
+            end = len(text)
+            length = self._length_function(text)
+            while end > 1 and length > self._chunk_size:
+                end = max(1, min(end - 1, end * self._chunk_size // length))
+                length = self._length_function(text[:end])
+            pieces.append([text[:end], length, len(self.SEPARATORS)])
+            text = text[end:]
+        return pieces
+
+    def _merge(self, pieces) -> list:
+        chunks = []
+        current, total = [], 0
+        for piece in pieces:
+            if current and total + piece[1] > self._chunk_size:
+                chunks.append("".join(text for text, _, _ in current).strip())
+                current = self._overlap(current)
+                total = sum(length for _, length, _ in current)
+                while current and total + piece[1] > self._chunk_size:
+                    total -= current.pop(0)[1]
+            current.append(piece)
+            total += piece[1]
+        if current:
+            chunks.append("".join(text for text, _, _ in current).strip())
+        return chunks
+
+    def _overlap(self, pieces) -> list:
+        """
+        Returns the trailing pieces of a finished chunk that are repeated at the start of the next one.
+        """
+        if self.adaptive_overlap and pieces[-1][2] == self.PARAGRAPH:
+            return []
+
+        carried, total = [], 0
+        # The first piece is never carried, so every chunk adds new text
+        for piece in reversed(pieces[1:]):
+            if total + piece[1] > self._chunk_overlap:
+                break
+            if self.adaptive_overlap and piece[2] == self.PARAGRAPH:
+                break
+            carried.insert(0, piece)
+            total += piece[1]
+        return carried
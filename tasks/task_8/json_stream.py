@@ -0,0 +1,197 @@
+import re
+
+class JsonPrefixValidator:
+    """
+    This class checks incrementally whether streamed LLM output is still a valid prefix of a JSON
+    object or array, so a malformed response can be abandoned before the rest of it is generated.
+
+    Text is fed in chunks as it arrives and is scanned once, character by character. The rules are
+    as lenient as the JsonOutputParser that parses the finished document: prose and a markdown code
+    fence (e.g. ```json) before the JSON are skipped, and raw control characters such as newlines are
+    accepted inside strings. The document must be an object or an array, and a response that has not
+    started one within MAX_PREAMBLE characters is rejected. Once the top-level value is closed the
+    document is complete, and any further text is ignored.
+    """
+
+    NUMBER = re.compile(r"-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?")
+    NUMBER_CHARS = set("0123456789+-.eE")
+    LITERALS = ("true", "false", "null")
+    WHITESPACE = set(" \t\r\n")
+    ESCAPES = set('"\\/bfnrtu')
+    MAX_PREAMBLE = 1000
+
+    def __init__(self):
+        self.state = "preamble"
+        self.stack = []  # Open containers, "{" or "["
+        self.token = ""  # Number, literal, or fence being read
+        self.string_is_key = False
+        self.unicode_digits = 0
+        self.preamble_length = 0
+        self.text = []  # Characters of the JSON document itself
+        self.valid = True
+        self.complete = False
+
+    @property
+    def document(self) -> str:
+        """
+        The JSON text read so far, without any code fence or trailing text.
+        """
+        return "".join(self.text)
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Scans the next chunk of streamed text.
+
+        :param chunk: The text received since the last call.
+        :return: True if everything received so far is a valid JSON prefix, False otherwise.
+        """
+        for char in chunk:
+            if not self.valid or self.complete:
+                break
+            self.valid = self._step(char)
+        return self.valid
+
+    def _step(self, char) -> bool:
+        state = self.state
+
+        if state in ("preamble", "fence"):
+            self.preamble_length += 1
+            if self.preamble_length > self.MAX_PREAMBLE:
+                return False
+
+        if state == "preamble":
+            if char == "`":
+                self.state, self.token = "fence", char
+            elif char in "{[":
+                return self._open(char)
+            # Anything else is prose before the JSON
+            return True
+
+        if state == "fence":
+            if char == "\n":
+                self.state = "preamble"
+            elif char != "\r":
+                self.token += char
+                # Backticks that do not open a fence, e.g. inline code, are part of the prose
+                if not re.fullmatch(r"`{1,3}|```[A-Za-z]*", self.token):
+                    self.state = "preamble"
+                    return self._step(char) if char in "`{[" else True
+            return True
+
+        if state in ("string", "escape", "unicode"):
+            self.text.append(char)
+            return self._string_step(char)
+
+        if state == "number":
+            if char in self.NUMBER_CHARS:
+                self.token += char
+                self.text.append(char)
+                return True
+            if not self.NUMBER.fullmatch(self.token):
+                return False
+            self._value_done()
+            return self._step(char)
+
+        if state == "literal":
+            self.token += char
+            self.text.append(char)
+            if not any(literal.startswith(self.token) for literal in self.LITERALS):
+                return False
+            if self.token in self.LITERALS:
+                self._value_done()
+            return True
+
+        if char in self.WHITESPACE:
+            self.text.append(char)
+            return True
+
+        if state in ("value", "value_or_close"):
+            if state == "value_or_close" and char == "]":
+                return self._close(char)
+            if char in "{[":
+                return self._open(char)
+            self.text.append(char)
+            if char == '"':
+                self.state, self.string_is_key = "string", False
+            elif char == "-" or char.isdigit():
+                self.state, self.token = "number", char
+            elif char in "tfn":
+                self.state, self.token = "literal", char
+            else:
+                return False
+            return True
+
+        if state in ("key", "key_or_close"):
+            if state == "key_or_close" and char == "}":
+                return self._close(char)
+            self.text.append(char)
+            if char != '"':
+                return False
+            self.state, self.string_is_key = "string", True
+            return True
+
+        if state == "colon":
+            self.text.append(char)
+            if char != ":":
+                return False
+            self.state = "value"
+            return True
+
+        if state == "after_value":
+            if char in "}]":
+                return self._close(char)
+            self.text.append(char)
+            if char != ",":
+                return False
+            self.state = "key" if self.stack[-1] == "{" else "value"
+            return True
+
+        return False
+
+    def _string_step(self, char) -> bool:
+        if self.state == "escape":
+            if char not in self.ESCAPES:
+                return False
+            if char == "u":
+                self.state, self.unicode_digits = "unicode", 0
+            else:
+                self.state = "string"
+            return True
+
+        if self.state == "unicode":
+            if char not in "0123456789abcdefABCDEF":
+                return False
+            self.unicode_digits += 1
+            if self.unicode_digits == 4:
+                self.state = "string"
+            return True
+
+        if char == "\\":
+            self.state = "escape"
+        elif char == '"':
+            if self.string_is_key:
+                self.state = "colon"
+            else:
+                self._value_done()
+        return True
+
+    def _open(self, char) -> bool:
+        self.text.append(char)
+        self.stack.append(char)
+        self.state = "key_or_close" if char == "{" else "value_or_close"
+        return True
+
+    def _close(self, char) -> bool:
+        self.text.append(char)
+        if not self.stack or {"{": "}", "[": "]"}[self.stack[-1]] != char:
+            return False
+        self.stack.pop()
+        self._value_done()
+        return True
+
+    def _value_done(self):
+        self.token = ""
+        if self.stack:
+            self.state = "after_value"
+        else:
+            self.complete = True
@@ -0,0 +1,129 @@
+import hashlib
+import re
+import unicodedata
+
+class QuestionIndex:
+    """
+    This class keeps a hashed index of normalized question text, so duplicate checks cost O(1)
+    regardless of how many questions are in the bank.
+
+    Questions are normalized before hashing (case, accents, punctuation and whitespace are ignored),
+    so trivial variants of the same question are treated as duplicates. Optionally, a 64-bit SimHash
+    of each question is indexed as well to catch near-duplicates such as light paraphrases. SimHashes
+    are split into bands so that, by the pigeonhole principle, any two hashes within the configured
+    Hamming distance share at least one band exactly; only those candidates are compared.
+
+    :param near_duplicate_distance: The maximum Hamming distance (in bits, out of 64) at which two questions are
+                                    considered near-duplicates. None disables near-duplicate detection.
+    """
+
+    HASH_BITS = 64
+
+    def __init__(self, near_duplicate_distance=None):
+        if near_duplicate_distance is not None and not 0 <= near_duplicate_distance < self.HASH_BITS:
+            raise ValueError(f"near_duplicate_distance must be between 0 and {self.HASH_BITS - 1}.")
+        self.near_duplicate_distance = near_duplicate_distance
+        self.hashes = set()
+        self.band_ranges = self._band_ranges(near_duplicate_distance)
+        self.bands = [{} for _ in self.band_ranges]
+
+    def __len__(self):
+        return len(self.hashes)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """
+        Normalizes question text so that casing, accents, punctuation and whitespace differences are ignored.
+
+        :param text: The question text.
+        :return: The normalized text.
+        """
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in text if not unicodedata.combining(char))
+        text = re.sub(r"[^\w\s]", " ", text.casefold())
+        return " ".join(text.split())
+
+    @staticmethod
+    def _digest(value: str, size: int) -> bytes:
+        return hashlib.blake2b(value.encode("utf-8"), digest_size=size).digest()
+
+    @classmethod
+    def simhash(cls, normalized_text: str) -> int:
+        """
+        Computes a 64-bit SimHash over the words and word pairs of normalized text.
+
+        :param normalized_text: Text returned by normalize().
+        :return: The SimHash as an integer.
+        """
+        words = normalized_text.split()
+        features = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+        weights = [0] * cls.HASH_BITS
+        for feature in features:
+            feature_hash = int.from_bytes(cls._digest(feature, 8), "big")
+            for bit in range(cls.HASH_BITS):
+                weights[bit] += 1 if feature_hash >> bit & 1 else -1
+
+        return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+    @classmethod
+    def _band_ranges(cls, distance):
+        """
+        Splits the hash bits into distance + 1 bands of (nearly) equal width.
+        """
+        if distance is None:
+            return []
+        count = distance + 1
+        width, extra = divmod(cls.HASH_BITS, count)
+        ranges, start = [], 0
+        for band in range(count):
+            end = start + width + (1 if band < extra else 0)
+            ranges.append((start, end))
+            start = end
+        return ranges
+
+    def _band_keys(self, simhash):
+        return [simhash >> start & ((1 << (end - start)) - 1) for start, end in self.band_ranges]
+
+    def contains(self, text: str) -> bool:
+        """
+        Checks whether a question, or a near-duplicate of it, is already indexed.
+
+        :param text: The question text.
+        :return: True if the question is a duplicate, False otherwise.
+        """
+        normalized = self.normalize(text)
+        if self._digest(normalized, 16) in self.hashes:
+            return True
+
+        if self.near_duplicate_distance is None:
+            return False
+
+        simhash = self.simhash(normalized)
+        for band, key in zip(self.bands, self._band_keys(simhash)):
+            for candidate in band.get(key, ()):
+                if bin(simhash ^ candidate).count("1") <= self.near_duplicate_distance:
+                    return True
+        return False
+
+    def add(self, text: str):
+        """
+        Adds a question to the index.
+
+        :param text: The question text.
+        """
+        normalized = self.normalize(text)
+        self.hashes.add(self._digest(normalized, 16))
+
+        if self.near_duplicate_distance is not None:
+            simhash = self.simhash(normalized)
+            for band, key in zip(self.bands, self._band_keys(simhash)):
+                band.setdefault(key, []).append(simhash)
+
+    def clear(self):
+        """
+        Removes every question from the index.
+        """
+        self.hashes.clear()
+        for band in self.bands:
+            band.clear()
@@ -0,0 +1,217 @@
+import copy
+import random
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from tasks.task_8.question_index import QuestionIndex
+from tasks.task_8.task_8_solution import QuizGenerator
+
+class QuestionPool:
+    """
+    This class pre-generates a pool of validated quiz questions for a corpus in the background, so
+    quizzes on topics the documents cover can be served without waiting for the LLM.
+
+    The chunk embeddings stored in the Chroma collection are grouped with spherical k-means, and
+    questions are generated from the chunks closest to each cluster centroid. A quiz topic is served
+    from every cluster whose centroid is similar enough to the topic embedding. Clusters are
+    published as soon as their questions are ready, so a partially built pool can already serve quizzes.
+
+    :param chroma_creator: A ChromaCollectionCreator whose collection has already been created.
+    :param num_clusters: The number of chunk clusters to generate questions for.
+    :param questions_per_cluster: The number of questions generated for each cluster, up to a maximum of 10.
+    :param coverage_threshold: The cosine similarity between a topic embedding and a cluster centroid at which the cluster covers the topic.
+    :param seed: The seed for the k-means initialization.
+    :param llm: An optional LangChain LLM used instead of the shared VertexAI clients.
+    :param max_concurrency: The maximum number of LLM calls the build makes at the same time. It is kept
+        low because the build shares the LLM clients and quota with the quizzes users are waiting for.
+    """
+
+    # Topic given to the LLM for pooled questions, which are based only on their cluster's chunks
+    CLUSTER_TOPIC = "the key ideas in the context"
+
+    def __init__(self, chroma_creator, num_clusters=8, questions_per_cluster=5, coverage_threshold=0.7, seed=0, llm=None,
+                 max_concurrency=1):
+        if questions_per_cluster > 10:
+            raise ValueError("questions_per_cluster cannot exceed 10.")
+        self.chroma_creator = chroma_creator
+        self.num_clusters = num_clusters
+        self.questions_per_cluster = questions_per_cluster
+        self.coverage_threshold = coverage_threshold
+        self.seed = seed
+        self.llm = llm
+        self.max_concurrency = max_concurrency
+        self.clusters = []  # Dictionaries with a unit-length "centroid" and the cluster's "questions"
+        self.question_index = QuestionIndex()
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.thread = None
+
+    def __len__(self):
+        with self.lock:
+            return sum(len(cluster["questions"]) for cluster in self.clusters)
+
+    def start(self, after=None):
+        """
+        Starts building the pool on a background thread. Calling start again has no effect.
+
+        :param after: An optional threading.Event the build waits for before its first LLM call, e.g.
+                      the end of the live quiz generation that would otherwise compete with it.
+        """
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self._build_in_background, args=(after,), daemon=True)
+        self.thread.start()
+
+    def wait(self, timeout=None) -> bool:
+        """
+        Blocks until the pool is built.
+
+        :param timeout: The maximum number of seconds to wait, or None to wait indefinitely.
+        :return: True if the pool is built, False if the timeout expired first.
+        """
+        return self.ready.wait(timeout)
+
+    def _build_in_background(self, after=None):
+        try:
+            if after is not None:
+                after.wait()
+            self.build()
+        except Exception as e:
+            print(f"Failed to pre-generate the question pool: {e}")
+        finally:
+            self.ready.set()
+
+    @staticmethod
+    def kmeans(vectors, k, iterations=20, seed=0):
+        """
+        Clusters unit-length vectors by cosine similarity, with k-means++ initialization.
+
+        :param vectors: A matrix of unit-length vectors, one row each.
+        :param k: The number of clusters. Fewer are returned if there are fewer distinct vectors.
+        :param iterations: The maximum number of refinement iterations.
+        :param seed: The seed for the initial centroid choice.
+        :return: A tuple of the unit-length centroids and the cluster label of each vector.
+        """
+        rng = np.random.default_rng(seed)
+        centroids = vectors[[rng.integers(len(vectors))]]
+        for _ in range(1, min(k, len(vectors))):
+            distances = np.clip(1 - (vectors @ centroids.T).max(axis=1), 0, None)
+            total = distances.sum()
+            if total == 0:
+                break
+            centroids = np.vstack([centroids, vectors[rng.choice(len(vectors), p=distances / total)]])
+
+        for _ in range(iterations):
+            labels = np.argmax(vectors @ centroids.T, axis=1)
+            updated = np.vstack([
+                vectors[labels == cluster].sum(axis=0) if np.any(labels == cluster) else centroids[cluster]
+                for cluster in range(len(centroids))
+            ])
+            updated /= np.linalg.norm(updated, axis=1, keepdims=True)
+            if np.allclose(updated, centroids):
+                break
+            centroids = updated
+
+        return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+    def build(self):
+        """
+        Clusters the collection's chunks and generates questions for each cluster, publishing each
+        cluster as soon as its questions are validated.
+        """
+        if self.chroma_creator.db is None:
+            raise ValueError("Chroma collection has not been created.")
+
+        collection = self.chroma_creator.db.get(include=["documents", "embeddings"])
+        documents = collection["documents"]
+        if not documents:
+            return
+
+        vectors = np.asarray(collection["embeddings"], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        centroids, labels = self.kmeans(vectors, self.num_clusters, seed=self.seed)
+
+        # Clusters holding more of the corpus are generated first
+        order = np.argsort(-np.bincount(labels, minlength=len(centroids)))
+        for cluster in order:
+            members = np.flatnonzero(labels == cluster)
+            if not len(members):
+                continue
+            nearest = members[np.argsort(-(vectors[members] @ centroids[cluster]))]
+            contexts = [documents[index] for index in nearest[:self.questions_per_cluster]]
+
+            generator = QuizGenerator(
+                self.CLUSTER_TOPIC, self.questions_per_cluster, self.chroma_creator,
+                max_concurrency=self.max_concurrency, llm=self.llm
+            )
+            questions = generator.generate_quiz_from_contexts(contexts)
+            self._publish(centroids[cluster], questions)
+            print(f"Pre-generated {len(questions)} questions for cluster {len(self.clusters)} of {len(centroids)}.")
+
+    def _publish(self, centroid, questions):
+        with self.lock:
+            # Questions already pooled for another cluster are dropped
+            unique = []
+            for question in questions:
+                if not self.question_index.contains(question["question"]):
+                    self.question_index.add(question["question"])
+                    unique.append(question)
+            self.clusters.append({"centroid": centroid, "questions": unique})
+
+    def sample(self, count, topic_embedding=None) -> list:
+        """
+        Returns a random subset of the pooled questions that cover a topic.
+
+        :param count: The maximum number of questions to return.
+        :param topic_embedding: The embedding of the quiz topic, or None to sample from the whole pool.
+        :return: A list of question copies, which may be shorter than count or empty.
+        """
+        with self.lock:
+            if topic_embedding is None:
+                covering = self.clusters
+            else:
+                query = np.asarray(topic_embedding, dtype=np.float32)
+                norm = np.linalg.norm(query)
+                if norm:
+                    query = query / norm
+                covering = [
+                    cluster for cluster in self.clusters
+                    if float(cluster["centroid"] @ query) >= self.coverage_threshold
+                ]
+            questions = [question for cluster in covering for question in cluster["questions"]]
+            if len(questions) > count:
+                questions = random.sample(questions, count)
+            return copy.deepcopy(questions)
+
+
+_question_pools = OrderedDict()
+_question_pools_lock = threading.Lock()
+
+def get_question_pool(chroma_creator, max_pools=16, after=None, **settings):
+    """
+    Returns the process-wide question pool for a corpus, creating it and starting its background build on first use.
+
+    Pools are keyed by the corpus fingerprint, so every user session and Streamlit rerun on the same
+    documents shares one pool. The least recently used pool is dropped once max_pools is reached.
+
+    :param chroma_creator: A ChromaCollectionCreator whose collection has already been created.
+    :param max_pools: The maximum number of corpora whose pools are kept.
+    :param after: An optional threading.Event a newly started build waits for, see QuestionPool.start.
+    :param settings: Keyword arguments for QuestionPool, used when the pool is first created.
+    :return: The shared QuestionPool for the corpus.
+    """
+    key = chroma_creator.fingerprint()
+    with _question_pools_lock:
+        pool = _question_pools.get(key)
+        if pool is None:
+            pool = QuestionPool(chroma_creator, **settings)
+            _question_pools[key] = pool
+            while len(_question_pools) > max_pools:
+                _question_pools.popitem(last=False)
+        _question_pools.move_to_end(key)
+    pool.start(after)
+    return pool
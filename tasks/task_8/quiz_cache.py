@@ -0,0 +1,147 @@
+import copy
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from tasks.task_8.question_index import QuestionIndex
+
+class QuizResponseCache:
+    """
+    This class caches generated quiz questions so that repeated requests for the same topic on the
+    same documents are served without calling the LLM.
+
+    Entries are keyed by the corpus fingerprint, the normalized topic, and the model name and
+    temperature used to generate them. Optionally, a request whose topic embedding is close enough
+    to a cached topic on the same corpus and model also counts as a hit. Entries expire after
+    ttl_seconds, and the least recently used entry is evicted once max_entries is reached.
+
+    A cached entry accumulates every unique question generated for its key, so a larger bank can be
+    sampled to serve a fresh random subset to each user.
+
+    :param max_entries: The maximum number of cached (corpus, topic, model, temperature) entries.
+    :param ttl_seconds: How long an entry stays valid after it was created.
+    :param similarity_threshold: The cosine similarity at which a different topic is served from a cached one, or None to only match exact normalized topics.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=24 * 60 * 60, similarity_threshold=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(corpus, topic, model_name, temperature):
+        return (corpus, QuestionIndex.normalize(topic), model_name, temperature)
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, now):
+        expired = [key for key, entry in self.entries.items() if now - entry["created"] > self.ttl_seconds]
+        for key in expired:
+            del self.entries[key]
+
+    def _find_similar(self, key, topic_embedding):
+        if self.similarity_threshold is None or topic_embedding is None:
+            return None
+        query = self._unit(topic_embedding)
+        best_key, best_score = None, self.similarity_threshold
+        for candidate_key, entry in self.entries.items():
+            # Only topics on the same corpus, model and temperature are interchangeable
+            if candidate_key[0] != key[0] or candidate_key[2:] != key[2:] or entry["topic_embedding"] is None:
+                continue
+            score = float(entry["topic_embedding"] @ query)
+            if score >= best_score:
+                best_key, best_score = candidate_key, score
+        return best_key
+
+    def get(self, corpus, topic, model_name, temperature, topic_embedding=None):
+        """
+        Looks up the cached questions for a request.
+
+        :param corpus: The fingerprint of the documents the quiz is based on.
+        :param topic: The quiz topic.
+        :param model_name: The name of the LLM.
+        :param temperature: The LLM temperature.
+        :param topic_embedding: An optional embedding of the topic, used for similarity lookups.
+        :return: A copy of every cached question for the request, or an empty list on a miss.
+        """
+        key = self.make_key(corpus, topic, model_name, temperature)
+        with self.lock:
+            self._expire(time.time())
+            if key not in self.entries:
+                key = self._find_similar(key, topic_embedding)
+            if key is None or key not in self.entries:
+                self.misses += 1
+                return []
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(self.entries[key]["questions"])
+
+    def sample(self, corpus, topic, model_name, temperature, count, topic_embedding=None):
+        """
+        Looks up cached questions and returns a random subset of at most count of them.
+
+        :return: A list of question copies, which may be shorter than count or empty.
+        """
+        questions = self.get(corpus, topic, model_name, temperature, topic_embedding)
+        if len(questions) > count:
+            questions = random.sample(questions, count)
+        return questions
+
+    def put(self, corpus, topic, model_name, temperature, questions, topic_embedding=None):
+        """
+        Adds generated questions to the cache, merging them with questions already cached for the request.
+
+        :param questions: A list of question dictionaries.
+        """
+        key = self.make_key(corpus, topic, model_name, temperature)
+        now = time.time()
+        with self.lock:
+            self._expire(now)
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = {
+                    "questions": [],
+                    "created": now,
+                    "topic_embedding": self._unit(topic_embedding) if topic_embedding is not None else None,
+                }
+                self.entries[key] = entry
+
+            index = QuestionIndex()
+            for question in entry["questions"]:
+                index.add(question["question"])
+            for question in questions:
+                if not index.contains(question["question"]):
+                    index.add(question["question"])
+                    entry["questions"].append(copy.deepcopy(question))
+
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+_shared_response_cache = None
+_shared_response_cache_lock = threading.Lock()
+
+def get_shared_response_cache(**settings):
+    """
+    Returns the process-wide quiz response cache, creating it on first use.
+
+    :param settings: Keyword arguments for QuizResponseCache, used when the cache is first created.
+    :return: The shared QuizResponseCache.
+    """
+    global _shared_response_cache
+    with _shared_response_cache_lock:
+        if _shared_response_cache is None:
+            _shared_response_cache = QuizResponseCache(**settings)
+        return _shared_response_cache
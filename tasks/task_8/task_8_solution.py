@@ -2,15 +2,59 @@ import streamlit as st
 import os
 import sys
 import json
+import contextvars
+import random
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from sympy import true
+import numpy as np
 sys.path.append(os.path.abspath('../../'))
 from tasks.task_3.task_3_solution import DocumentProcessor
 from tasks.task_4.task_4_solution import EmbeddingClient
 from tasks.task_5.task_5_solution import ChromaCollectionCreator
+from tasks.task_8.question_index import QuestionIndex
+from tasks.task_8.json_stream import JsonPrefixValidator
+from tasks.instrumentation import instrumentation
+from google.api_core import exceptions as google_exceptions
+from langchain_core.exceptions import OutputParserException
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.prompts import PromptTemplate
-from langchain_google_vertexai import VertexAI
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough, RunnableParallel
+from langchain_core.utils.json import parse_partial_json
+
+# Vertex AI errors that are worth retrying after a short wait
+TRANSIENT_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+)
+
+_llm_pool = {}
+_llm_pool_lock = threading.Lock()
+
+def get_llm(model_name, temperature, max_output_tokens):
+    """
+    Returns the process-wide VertexAI client for a configuration, creating it on first use.
+
+    Generators for every quiz and every user session share the same clients, so connections and
+    auth tokens are reused instead of being set up again for each quiz.
+
+    :return: A shared VertexAI instance.
+    """
+    key = (model_name, temperature, max_output_tokens)
+    with _llm_pool_lock:
+        if key not in _llm_pool:
+            # Imported on first use, since loading the Vertex AI SDK dominates app start-up time
+            from langchain_google_vertexai import VertexAI
+            _llm_pool[key] = VertexAI(
+                model_name=model_name,
+                temperature=temperature,
+                max_output_tokens=max_output_tokens
+            )
+        return _llm_pool[key]
 
 class QuizGenerator:
     """
@@ -20,16 +64,69 @@ class QuizGenerator:
     :param topic: A string representing the required topic of the quiz.
     :param num_questions: An integer representing the number of questions to generate for the quiz, up to a maximum of 10.
     :param vectorstore: An optional vectorstore instance (e.g., ChromaDB) to be used for querying information related to the quiz topic.
+    :param max_concurrency: The maximum number of questions requested from the LLM at the same time, defaults to the number of questions so a quiz takes one round of LLM calls.
+    :param distinct_context: If True, the topic is retrieved once per quiz and each question is generated from its own group of chunks.
+    :param chunks_per_question: The number of retrieved chunks given to each question when distinct_context is enabled.
+    :param batch_mode: If True, all questions are requested from the LLM as one JSON array in a single call.
+    :param max_batch_rounds: The maximum number of batch calls used to fill the quiz when batch_mode is enabled.
+    :param max_attempts: The maximum number of question requests used to fill the quiz, defaults to twice the number of questions.
+    :param max_retries: The number of times a request is retried after a transient Vertex AI error.
+    :param backoff_base: The base delay in seconds for the jittered exponential backoff between retries.
+    :param near_duplicate_distance: The maximum SimHash Hamming distance at which questions are rejected as near-duplicates, or None to only reject normalized exact matches.
+    :param semantic_threshold: The cosine similarity above which a question is rejected as a semantic duplicate of an accepted one, or None to disable embedding-based dedup.
+    :param embed_client: The embedding client used for semantic dedup, defaults to the vectorstore's embedding model.
+    :param response_cache: An optional QuizResponseCache; cached questions for the same corpus, topic and model are served without calling the LLM.
+    :param question_pool: An optional QuestionPool of pre-generated questions for the corpus; questions from clusters that cover the topic are served before calling the LLM.
+    :param stream_tokens: If True, single questions are read from the LLM token stream and malformed JSON is abandoned as soon as it is detected.
+    :param on_partial: An optional callback that receives the partially parsed question as tokens arrive when stream_tokens is enabled. It is called from worker threads.
+    :param llm: An optional LangChain LLM used instead of the shared VertexAI clients, e.g. a local stand-in for offline benchmarks.
+    :param cancel: An optional threading.Event. Once it is set, generation stops before the next round of LLM calls, e.g. when the user leaves the quiz.
     """
 
-    def __init__(self, topic=None, num_questions=1, vectorstore=None):
+    def __init__(self, topic=None, num_questions=1, vectorstore=None, max_concurrency=None,
+                 distinct_context=False, chunks_per_question=1, batch_mode=False, max_batch_rounds=3,
+                 max_attempts=None, max_retries=3, backoff_base=0.5, near_duplicate_distance=None,
+                 semantic_threshold=None, embed_client=None, response_cache=None, question_pool=None,
+                 stream_tokens=False, on_partial=None, llm=None, cancel=None):
         self.topic = topic if topic else "General Knowledge"
+        self.general_topic = not topic  # No topic given, so questions may cover any part of the documents
         if num_questions > 10:
             raise ValueError("Number of questions cannot exceed 10.")
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
         self.num_questions = num_questions
+        self.max_concurrency = max_concurrency if max_concurrency is not None else max(1, num_questions)
+        self.distinct_context = distinct_context
+        self.chunks_per_question = chunks_per_question
+        self.batch_mode = batch_mode
+        self.max_batch_rounds = max_batch_rounds
+        self.max_attempts = max_attempts if max_attempts is not None else num_questions * 2
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.wasted_attempts = 0  # LLM calls of the last quiz that did not produce an accepted question
         self.vectorstore = vectorstore
-        self.llm = None
+        self.model_name = "gemini-pro"
+        self.temperature = 0.8
+        self.max_output_tokens = 500  # Output token budget for a single question
+        self.llm = llm
+        self.batch_llm = llm
+        self.chain = None
+        self.question_chain = None
+        self.batch_chain = None
+        self.retriever = None
+        self.prompt = None
+        self._chain_key = None
         self.question_bank = []
+        self.question_index = QuestionIndex(near_duplicate_distance)
+        self.semantic_threshold = semantic_threshold
+        self.embed_client = embed_client if embed_client else getattr(vectorstore, "embed_model", None)
+        self.question_embeddings = None  # Unit-length embeddings of the accepted questions, one row each
+        self.response_cache = response_cache
+        self.question_pool = question_pool
+        self.stream_tokens = stream_tokens
+        self.on_partial = on_partial
+        self.cancel = cancel
+        self._topic_embedding = None  # (topic, embedding) of the last embedded topic
         self.system_template = """
             You are a subject matter expert on the topic: {topic}
             
@@ -52,6 +149,33 @@ class QuizGenerator:
                 "explanation": "<explanation as to why the answer is correct>"
             }}
             
+            Context: {context}
+            """
+        self.batch_system_template = """
+            You are a subject matter expert on the topic: {topic}
+            
+            Follow the instructions to create {num_questions} quiz questions:
+            1. Generate {num_questions} different questions based on the topic provided and context, each as key "question"
+            2. Provide 4 multiple choice answers to each question as a list of key-value pairs "choices"
+            3. Provide the correct answer for each question from its list of answers as key "answer"
+            4. Provide an explanation as to why the answer is correct as key "explanation"
+            5. Do not repeat any of these existing questions: {existing_questions}
+            
+            You must respond as a JSON array of exactly {num_questions} objects with the following structure:
+            [
+                {{
+                    "question": "<question>",
+                    "choices": [
+                        {{"key": "A", "value": "<choice>"}},
+                        {{"key": "B", "value": "<choice>"}},
+                        {{"key": "C", "value": "<choice>"}},
+                        {{"key": "D", "value": "<choice>"}}
+                    ],
+                    "answer": "<answer key from choices list>",
+                    "explanation": "<explanation as to why the answer is correct>"
+                }}
+            ]
+            
             Context: {context}
             """
         self.json_output_parser = JsonOutputParser()
@@ -63,82 +187,652 @@ class QuizGenerator:
         This method should handle any setup required to interact with the LLM, including authentication,
         setting up any necessary parameters, or selecting a specific model.
         """
-        self.llm = VertexAI(
-            model_name="gemini-pro",
-            temperature=0.8, 
-            max_output_tokens=500
+        self.llm = get_llm(self.model_name, self.temperature, self.max_output_tokens)
+
+    def init_batch_llm(self):
+        """
+        Initializes the LLM used for batched generation, with an output budget sized for the whole quiz.
+        """
+        self.batch_llm = get_llm(self.model_name, self.temperature, self.max_output_tokens * self.num_questions)
+
+    def _current_chain_key(self):
+        """
+        Identifies the inputs the compiled chain depends on, so a stale chain can be detected.
+        """
+        return (
+            id(self.vectorstore),
+            id(getattr(self.vectorstore, "db", None)),
+            self.system_template,
+            self.batch_system_template,
+            id(self.llm),
+            id(self.batch_llm),
+            instrumentation.enabled,
         )
 
-    def generate_question_with_vectorstore(self):
+    def build_chain(self):
         """
-        Generates a quiz question based on the topic provided using a vectorstore.
+        Compiles the retrieval chain used to generate quiz questions.
 
-        :return: A JSON object representing the generated quiz question.
+        The retriever, prompt and pipeline are built once and reused for every question, so each
+        question only pays for the retrieval and the LLM call. The retrieval-free tail of the
+        pipeline is kept as `question_chain` for questions whose context is retrieved up front.
+
+        :return: The compiled chain.
         """
         if self.llm is None:
             self.init_llm()
         if self.vectorstore is None:
             raise ValueError("Vectorstore not provided.")
-        
-        from langchain_core.runnables import RunnablePassthrough, RunnableParallel
 
         retriever = self.vectorstore.as_retriever()
         prompt = PromptTemplate.from_template(self.system_template)
-        
+
         setup_and_retrieval = RunnableParallel(
             {"context": retriever, "topic": RunnablePassthrough()}
         )
-        chain = setup_and_retrieval | prompt | self.llm | self.json_output_parser
+        self.question_chain = prompt | self._with_usage_callback(self.llm) | RunnableLambda(self.parse_json)
+        self.chain = setup_and_retrieval | self.question_chain
+        self.retriever = retriever
+        self.prompt = prompt
 
-        response = chain.invoke(self.topic)
-        return response
+        if self.batch_mode:
+            if self.batch_llm is None:
+                self.init_batch_llm()
+            batch_prompt = PromptTemplate.from_template(self.batch_system_template)
+            self.batch_chain = batch_prompt | self._with_usage_callback(self.batch_llm) | RunnableLambda(self.parse_json)
 
-    def generate_quiz(self) -> list:
+        self._chain_key = self._current_chain_key()
+        return self.chain
+
+    def parse_json(self, text):
         """
-        Generates a list of unique quiz questions based on the specified topic and number of questions.
+        Parses an LLM response with the JSON output parser, recorded as its own "parse_json" span.
 
-        :return: A list of dictionaries, where each dictionary represents a unique quiz question generated based on the topic.
+        :param text: The LLM response.
+        :return: The parsed JSON value.
+        :raises OutputParserException: If the response is not valid JSON.
         """
-        self.question_bank = []
+        with instrumentation.span("parse_json", chars=len(text)):
+            return self.json_output_parser.parse(text)
 
-        for _ in range(self.num_questions):
-            question_str = self.generate_question_with_vectorstore()
-            
-            # Check if the response is already a dictionary
-            if isinstance(question_str, dict):
-                question = question_str
+    @staticmethod
+    def _with_usage_callback(llm):
+        """
+        Attaches the instrumentation callback to an LLM while instrumentation is enabled, so every call records its latency and token usage.
+        """
+        if not instrumentation.enabled:
+            return llm
+        return llm.with_config(callbacks=[instrumentation.llm_callback])
+
+    def invalidate_chain(self):
+        """
+        Discards the compiled chain so the next question rebuilds it.
+
+        Call this after replacing the vectorstore, the system template or the LLM.
+        """
+        self.chain = None
+        self.question_chain = None
+        self.batch_chain = None
+        self.retriever = None
+        self.prompt = None
+        self._chain_key = None
+
+    def retrieve_context_groups(self, extra_groups=0) -> list:
+        """
+        Retrieves the top chunks for the topic once and splits them into one context per question.
+
+        The top `num_questions * chunks_per_question` chunks are dealt out round-robin, so every
+        question gets different source material. The next `extra_groups * chunks_per_question` chunks
+        are dealt out the same way into groups for top-up requests, so a replacement question does not
+        see the chunks of a question that was already accepted. If fewer chunks exist than groups,
+        chunks are reused from the start.
+
+        :param extra_groups: The number of context groups retrieved for top-up requests.
+        :return: A list of context strings, one for each question followed by one for each top-up request.
+        """
+        if self.vectorstore is None:
+            raise ValueError("Vectorstore not provided.")
+
+        first_round = self.num_questions * self.chunks_per_question
+        k = first_round + extra_groups * self.chunks_per_question
+        with instrumentation.span("retrieve", k=k) as span:
+            retriever = self.vectorstore.as_retriever(search_kwargs={"k": k})
+            docs = retriever.invoke(self.topic)
+            span.set(docs=len(docs))
+
+        groups = [[] for _ in range(self.num_questions + extra_groups)]
+        for index, doc in enumerate(docs[:k]):
+            if index < first_round:
+                groups[index % self.num_questions].append(doc)
+            else:
+                groups[self.num_questions + (index - first_round) % extra_groups].append(doc)
+        for index, group in enumerate(groups):
+            if not group and docs:
+                group.append(docs[index % len(docs)])
+
+        return ["\n\n".join(doc.page_content for doc in group) for group in groups]
+
+    def generate_question_with_vectorstore(self, context=None):
+        """
+        Generates a quiz question based on the topic provided using a vectorstore.
+
+        :param context: Optional pre-retrieved context. If provided, the vectorstore is not queried again.
+        :return: A JSON object representing the generated quiz question.
+        """
+        if self.llm is None:
+            self.init_llm()
+        if self.vectorstore is None:
+            raise ValueError("Vectorstore not provided.")
+
+        if self.chain is None or self._chain_key != self._current_chain_key():
+            self.build_chain()
+
+        with instrumentation.span("generate_question", streamed=self.stream_tokens, retrieved=context is None):
+            if self.stream_tokens:
+                return self.stream_question(context)
+
+            if context is not None:
+                response = self.question_chain.invoke({"context": context, "topic": self.topic})
             else:
-                try:
-                    question = json.loads(question_str)
-                except json.JSONDecodeError:
-                    print("Failed to decode question JSON.")
-                    continue
+                response = self.chain.invoke(self.topic)
+            return response
+
+    def stream_question(self, context=None):
+        """
+        Generates a quiz question from the LLM token stream, checking the JSON as it arrives.
+
+        The stream is abandoned as soon as the output can no longer be valid JSON, or as soon as the
+        question object is complete, so no tokens are paid for after either point. If on_partial is
+        set, it receives the partially parsed question after every chunk.
+
+        :param context: Optional pre-retrieved context. If not provided, the vectorstore is queried for the topic.
+        :return: A JSON object representing the generated quiz question.
+        :raises OutputParserException: If the output is malformed or ends before the JSON is complete.
+        """
+        if self.chain is None or self._chain_key != self._current_chain_key():
+            self.build_chain()
+        if context is None:
+            context = self.retriever.invoke(self.topic)
+
+        validator = JsonPrefixValidator()
+        received = 0
+        stream = self._with_usage_callback(self.llm).stream(self.prompt.invoke({"context": context, "topic": self.topic}))
+        try:
+            for chunk in stream:
+                received += len(chunk)
+                if not validator.feed(chunk):
+                    print(f"Aborted malformed question JSON after {received} characters.")
+                    raise OutputParserException(f"Malformed JSON in streamed response: {validator.document!r}")
+                if self.on_partial is not None and validator.document:
+                    partial = parse_partial_json(validator.document)
+                    if isinstance(partial, dict):
+                        self.on_partial(partial)
+                if validator.complete:
+                    break
+        finally:
+            stream.close()
+
+        if not validator.complete:
+            raise OutputParserException(f"Streamed response ended before the JSON was complete: {validator.document!r}")
+        return self.parse_json(validator.document)
+
+    def generate_questions_batch(self, count, context) -> list:
+        """
+        Generates several quiz questions with a single LLM call.
+
+        :param count: The number of questions to request.
+        :param context: The retrieved context the questions should be based on.
+        :return: A list of the question objects returned by the LLM, not yet validated.
+        """
+        if self.batch_chain is None or self._chain_key != self._current_chain_key():
+            self.build_chain()
+
+        existing_questions = [question['question'] for question in self.question_bank]
+        response = self.batch_chain.invoke({
+            "topic": self.topic,
+            "num_questions": count,
+            "existing_questions": json.dumps(existing_questions) if existing_questions else "None",
+            "context": context
+        })
+
+        # A single question may come back as a bare object instead of an array
+        if isinstance(response, dict):
+            return [response]
+        if isinstance(response, list):
+            return response
+        return []
+
+    def _invoke_with_backoff(self, func, *args):
+        """
+        Calls func, retrying transient Vertex AI errors with jittered exponential backoff.
+
+        Responses that cannot be parsed as JSON are not retried here; they are returned as None
+        so the caller can request a replacement question.
+
+        :return: A tuple of the response (or None if the call failed) and the number of failed calls.
+        """
+        failed_calls = 0
+        for retry in range(self.max_retries + 1):
+            try:
+                return func(*args), failed_calls
+            except OutputParserException:
+                print("Failed to decode question JSON.")
+                instrumentation.count("llm.malformed_responses")
+                return None, failed_calls + 1
+            except TRANSIENT_ERRORS as e:
+                failed_calls += 1
+                instrumentation.count("llm.transient_errors")
+                if retry == self.max_retries:
+                    print(f"Giving up after {failed_calls} transient errors: {e}")
+                    break
+                time.sleep(random.uniform(0, self.backoff_base * 2 ** retry))
+        return None, failed_calls
+
+    def parse_question(self, response):
+        """
+        Converts an LLM response into a question dictionary.
 
+        :param response: A dictionary or JSON string returned by the chain.
+        :return: The question dictionary, or None if the response cannot be decoded.
+        """
+        # Check if the response is already a dictionary
+        if isinstance(response, dict):
+            return response
+        try:
+            question = json.loads(response)
+        except (TypeError, json.JSONDecodeError):
+            print("Failed to decode question JSON.")
+            return None
+        return question if isinstance(question, dict) else None
+
+    def add_question(self, response) -> bool:
+        """
+        Decodes and validates a response, adding it to the question bank if it is a unique question.
+
+        :param response: A dictionary or JSON string returned by the chain.
+        :return: True if the question was added, False otherwise.
+        """
+        return self.add_questions([response]) == 1
+
+    def add_questions(self, responses) -> int:
+        """
+        Decodes and validates a round of responses, adding the unique questions to the question bank in order.
+
+        When semantic dedup is enabled, the candidates that pass the hash check are embedded with a
+        single embed_documents call before being compared against the accepted questions.
+
+        :param responses: A list of dictionaries or JSON strings returned by the chain.
+        :return: The number of questions added.
+        """
+        candidates = []
+        for response in responses:
+            question = self.parse_question(response)
+            if question is None:
+                continue
+            if not self.is_well_formed(question):
+                print("Malformed question rejected.")
+                instrumentation.count("quiz.malformed_questions")
+                continue
             if self.validate_question(question):
-                print("Successfully generated unique question")
-                self.question_bank.append(question)
+                candidates.append(question)
             else:
                 print("Duplicate or invalid question detected.")
+                instrumentation.count("quiz.duplicates_rejected")
+
+        embeddings = self._embed_questions(candidates)
 
+        added = 0
+        for position, question in enumerate(candidates):
+            embedding = embeddings[position] if embeddings is not None else None
+
+            # Candidates from the same round are checked again against the ones accepted before them
+            if not self.validate_question(question) or self._is_semantic_duplicate(embedding):
+                print("Duplicate or invalid question detected.")
+                instrumentation.count("quiz.duplicates_rejected")
+                continue
+
+            print("Successfully generated unique question")
+            instrumentation.count("quiz.questions_accepted")
+            self.question_bank.append(question)
+            self.question_index.add(question['question'])
+            if embedding is not None:
+                self._add_question_embedding(embedding)
+            added += 1
+
+        return added
+
+    def _embed_questions(self, questions):
+        """
+        Embeds question texts in one batch for semantic dedup.
+
+        :return: A matrix of unit-length embeddings, one row per question, or None if semantic dedup is disabled or unavailable.
+        """
+        if self.semantic_threshold is None or self.embed_client is None or not questions:
+            return None
+
+        vectors = self.embed_client.embed_documents([question['question'] for question in questions])
+        if not vectors:
+            return None
+
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def _is_semantic_duplicate(self, embedding) -> bool:
+        """
+        Checks whether an embedding is too similar to any accepted question, using one matrix-vector product.
+        """
+        if embedding is None or self.question_embeddings is None:
+            return False
+        return float(np.max(self.question_embeddings @ embedding)) > self.semantic_threshold
+
+    def _add_question_embedding(self, embedding):
+        if self.question_embeddings is None:
+            self.question_embeddings = embedding[np.newaxis, :]
+        else:
+            self.question_embeddings = np.vstack([self.question_embeddings, embedding])
+
+    def generate_quiz(self) -> list:
+        """
+        Generates a list of unique quiz questions based on the specified topic and number of questions.
+
+        Up to `max_concurrency` questions are requested from the LLM at once. The responses are
+        validated in request order, so the resulting question bank is stable between runs.
+        Questions that fail to decode or are rejected as duplicates are topped up by requesting
+        only the shortfall, until the quiz is full or `max_attempts` requests have been made.
+        With `distinct_context` enabled, the topic is retrieved once and each question is generated
+        from its own chunks instead of re-running the same query. With `batch_mode` enabled, the
+        whole quiz is requested in one call and only the missing questions are requested again.
+        With a `response_cache`, cached questions for the same request are served first, followed by
+        pre-generated questions from a `question_pool`, and only the remainder is generated.
+
+        :return: A list of dictionaries, where each dictionary represents a unique quiz question generated based on the topic.
+        """
+        for _ in self.iter_quiz():
+            pass
         return self.question_bank
 
+    def iter_quiz(self):
+        """
+        Generates the quiz like generate_quiz, yielding each validated question as soon as it is accepted.
+
+        Questions are yielded in the same order as they appear in the question bank, so the first
+        question is available after a single LLM call instead of after the whole quiz.
+
+        :return: An iterator of unique quiz question dictionaries.
+        """
+        # The span covers the whole quiz but is only current while the quiz is being generated, so
+        # spans the caller opens between questions are not recorded as its children
+        span = instrumentation.span("generate_quiz", num_questions=self.num_questions)
+        return span.iterate(self._iter_quiz(span))
+
+    def _iter_quiz(self, span):
+        self.question_bank = []
+        self.question_index.clear()
+        self.question_embeddings = None
+        self.wasted_attempts = 0
+
+        corpus, topic_embedding = self._response_cache_key()
+        if corpus is not None:
+            self.add_questions(self.response_cache.sample(
+                corpus, self.topic, self.model_name, self.temperature, self.num_questions, topic_embedding
+            ))
+            span.set(from_cache=len(self.question_bank))
+            instrumentation.count("quiz.response_cache_hits" if self.question_bank else "quiz.response_cache_misses")
+            yield from list(self.question_bank)
+            if len(self.question_bank) >= self.num_questions:
+                print("Served quiz from the response cache.")
+                return
+
+        if self.question_pool is not None and (self.general_topic or self.embed_client is not None):
+            served = len(self.question_bank)
+            self.add_questions(self.question_pool.sample(
+                self.num_questions - len(self.question_bank),
+                None if self.general_topic else self.embed_topic()
+            ))
+            span.set(from_pool=len(self.question_bank) - served)
+            instrumentation.count("quiz.question_pool_hits" if len(self.question_bank) > served else "quiz.question_pool_misses")
+            yield from self.question_bank[served:]
+            if len(self.question_bank) >= self.num_questions:
+                print("Served quiz from the question pool.")
+                return
+
+        # Compile the chain once up front so the worker threads share a single pipeline
+        if self.chain is None or self._chain_key != self._current_chain_key():
+            self.build_chain()
+
+        served = len(self.question_bank)
+        if self.batch_mode:
+            yield from self._generate_quiz_batched()
+        else:
+            yield from self._generate_quiz_concurrently()
+        self._report_attempts()
+        span.set(generated=len(self.question_bank) - served, wasted_attempts=self.wasted_attempts)
+        if self.cancelled():
+            # An abandoned quiz may be incomplete, so it is not cached
+            span.set(cancelled=True)
+            print("Quiz generation cancelled.")
+            return
+
+        if corpus is not None:
+            self.response_cache.put(
+                corpus, self.topic, self.model_name, self.temperature, self.question_bank, topic_embedding
+            )
+
+    def generate_quiz_in_background(self, questions, done) -> threading.Thread:
+        """
+        Generates the quiz on a background thread, appending each validated question to a shared list as soon as it is accepted.
+
+        :param questions: The list the questions are appended to, e.g. a list kept in the Streamlit session state.
+        :param done: A threading.Event that is set once generation has finished, whether or not it succeeded.
+                     Set the generator's cancel event to make it finish early.
+        :return: The started thread.
+        """
+        def run():
+            try:
+                for question in self.iter_quiz():
+                    questions.append(question)
+            except Exception as e:
+                print(f"Quiz generation failed: {e}")
+            finally:
+                done.set()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def _response_cache_key(self):
+        """
+        Works out the response cache lookup for this quiz.
+
+        :return: A tuple of the corpus fingerprint and the topic embedding (None unless similarity lookups
+                 are enabled), or (None, None) if there is no response cache or the corpus cannot be fingerprinted.
+        """
+        fingerprint = getattr(self.vectorstore, "fingerprint", None)
+        if self.response_cache is None or fingerprint is None:
+            return None, None
+
+        topic_embedding = None
+        if self.response_cache.similarity_threshold is not None and self.embed_client is not None:
+            topic_embedding = self.embed_topic()
+        return fingerprint(), topic_embedding
+
+    def embed_topic(self):
+        """
+        Embeds the quiz topic, reusing the embedding until the topic changes.
+
+        :return: The topic embedding.
+        """
+        if self._topic_embedding is None or self._topic_embedding[0] != self.topic:
+            self._topic_embedding = (self.topic, self.embed_client.embed_query(self.topic))
+        return self._topic_embedding[1]
+
+    def generate_quiz_from_contexts(self, contexts) -> list:
+        """
+        Generates a quiz from pre-selected contexts instead of retrieving them for the topic.
+
+        The response cache and question pool are bypassed. Questions are generated concurrently and
+        topped up like in generate_quiz, with the contexts used in rotation.
+
+        :param contexts: A non-empty list of context strings.
+        :return: A list of unique quiz question dictionaries.
+        """
+        if not contexts:
+            raise ValueError("At least one context is required.")
+        self.question_bank = []
+        self.question_index.clear()
+        self.question_embeddings = None
+        self.wasted_attempts = 0
+
+        if self.chain is None or self._chain_key != self._current_chain_key():
+            self.build_chain()
+        for _ in self._generate_quiz_concurrently(contexts):
+            pass
+        self._report_attempts()
+        return self.question_bank
+
+    def cancelled(self) -> bool:
+        """
+        Returns True if the cancel event is set.
+        """
+        return self.cancel is not None and self.cancel.is_set()
+
+    def _generate_quiz_concurrently(self, contexts=None):
+        """
+        Fills the question bank with concurrent single-question requests, topping up the shortfall.
+
+        Responses are validated in request order as soon as each one arrives, and every accepted
+        question is yielded immediately. With semantic dedup enabled, the responses of a round are
+        validated together instead, once all of them have arrived, so the round's questions are
+        embedded with a single call.
+
+        :param contexts: Optional pre-selected contexts, used in rotation instead of retrieving them for the topic.
+        :return: An iterator of the accepted questions.
+        """
+        if contexts is None and self.distinct_context:
+            contexts = self.retrieve_context_groups(extra_groups=max(0, self.max_attempts - self.num_questions))
+        elif contexts is None:
+            contexts = [None] * self.num_questions
+
+        attempts = 0
+        workers = max(1, min(self.max_concurrency, self.num_questions))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while len(self.question_bank) < self.num_questions and attempts < self.max_attempts and not self.cancelled():
+                shortfall = min(self.num_questions - len(self.question_bank), self.max_attempts - attempts)
+
+                # Every request takes the next context group, so top-ups get the groups retrieved for them;
+                # only pre-selected contexts are used in rotation
+                request_contexts = [contexts[(attempts + i) % len(contexts)] for i in range(shortfall)]
+                attempts += shortfall
+
+                # Each request runs in a copy of this context, so its spans nest under the current span
+                futures = [
+                    executor.submit(
+                        contextvars.copy_context().run,
+                        self._invoke_with_backoff, self.generate_question_with_vectorstore, context
+                    )
+                    for context in request_contexts
+                ]
+
+                # Without semantic dedup, validating a question costs no embedding call
+                group_size = len(futures) if self.semantic_threshold is not None else 1
+                for start in range(0, len(futures), group_size):
+                    if self.cancelled():
+                        # Requests still queued behind max_concurrency are dropped before they are sent
+                        for future in futures[start:]:
+                            future.cancel()
+                        break
+                    responses = []
+                    for future in futures[start:start + group_size]:
+                        response, failed_calls = future.result()
+                        self.wasted_attempts += failed_calls
+                        if response is not None:
+                            responses.append(response)
+                    added = self.add_questions(responses)
+                    self.wasted_attempts += len(responses) - added
+                    if added:
+                        yield from self.question_bank[-added:]
+
+    def _report_attempts(self):
+        """
+        Prints how many LLM calls were wasted and whether the quiz reached the requested size.
+        """
+        print(f"Generated {len(self.question_bank)}/{self.num_questions} questions "
+              f"with {self.wasted_attempts} wasted attempts.")
+        if len(self.question_bank) < self.num_questions:
+            print("Attempt budget exhausted before the quiz was full.")
+
+    def _generate_quiz_batched(self):
+        """
+        Fills the question bank with batch calls, re-requesting only the missing or invalid questions.
+
+        A batch cut off by the output token limit still parses, with its last question incomplete; that
+        question fails is_well_formed and is requested again in the next round.
+
+        :return: An iterator of the accepted questions, yielded after each batch call.
+        """
+        # Retrieve once; every batch round reuses the same context
+        context = "\n\n".join(self.retrieve_context_groups())
+
+        for _ in range(self.max_batch_rounds):
+            missing = self.num_questions - len(self.question_bank)
+            if missing <= 0 or self.cancelled():
+                break
+
+            responses, failed_calls = self._invoke_with_backoff(self.generate_questions_batch, missing, context)
+            self.wasted_attempts += failed_calls
+            responses = (responses or [])[:missing]
+            accepted = self.add_questions(responses)
+            self.wasted_attempts += len(responses) - accepted
+            if accepted:
+                yield from self.question_bank[-accepted:]
+
+    @staticmethod
+    def is_well_formed(question) -> bool:
+        """
+        Checks that a question has the structure the quiz pages rely on: a question text, exactly four
+        choices with a key and a value each, an answer matching one of the choice keys, and an explanation.
+
+        JsonOutputParser completes truncated JSON, so a response cut off by the output token limit
+        parses without error but lacks some of these fields.
+
+        :param question: A decoded question.
+        :return: True if the question is complete, False otherwise.
+        """
+        if not isinstance(question, dict):
+            return False
+        choices = question.get("choices")
+        if not isinstance(question.get("question"), str) or not question["question"].strip():
+            return False
+        if not isinstance(choices, list) or len(choices) != 4:
+            return False
+        if not all(isinstance(choice, dict) and "key" in choice and "value" in choice for choice in choices):
+            return False
+        if question.get("answer") not in [choice["key"] for choice in choices]:
+            return False
+        return isinstance(question.get("explanation"), str) and bool(question["explanation"].strip())
+
     def validate_question(self, question: dict) -> bool:
         """
-        Validates the uniqueness of a generated question.
+        Validates the structure and the uniqueness of a generated question.
+
+        Questions are looked up in a hashed index of normalized text, so the check is O(1) and ignores
+        differences in casing, punctuation and whitespace. If near-duplicate detection is enabled,
+        paraphrases within the configured SimHash distance are rejected as well.
 
         :param question: A dictionary representing a quiz question.
-        :return: True if the question is unique, False otherwise.
+        :return: True if the question is complete and unique, False otherwise.
         """
-        if 'question' not in question:
+        if not self.is_well_formed(question):
             return False
 
-        question_text = question['question']
+        # Re-index if the question bank was modified directly
+        if len(self.question_index) != len(self.question_bank):
+            self.question_index.clear()
+            for existing_question in self.question_bank:
+                self.question_index.add(existing_question['question'])
 
-        for existing_question in self.question_bank:
-            if question_text == existing_question['question']:
-                return False
-            
-        return True
+        return not self.question_index.contains(question['question'])
 
 if __name__ == "__main__":
     embed_config = {
@@ -0,0 +1,51 @@
+import hashlib
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from langchain_core.documents import Document
+from benchmarks.fakes import HashingEmbeddings
+from tasks.task_4.task_4_solution import EmbeddingClient
+from tasks.task_5.task_5_solution import ChromaCollectionCreator
+
+
+class StaticProcessor:
+    """
+    Stands in for DocumentProcessor with pages that are already extracted.
+    """
+
+    def __init__(self, texts):
+        self.pages = [
+            Document(page_content=text, metadata={"file_hash": hashlib.sha256(text.encode("utf-8")).hexdigest()})
+            for text in texts
+        ]
+        self.file_hashes = [page.metadata["file_hash"] for page in self.pages]
+
+
+def creator(tmp_path, texts):
+    embed_client = EmbeddingClient("hashing", project=None, location=None, client=HashingEmbeddings(dimensions=64))
+    return ChromaCollectionCreator(StaticProcessor(texts), embed_client, persist_directory=str(tmp_path))
+
+
+TEXTS = [f"Paragraph {index} explains how mitochondria turn nutrients into energy." for index in range(5)]
+
+
+def test_update_opens_the_named_collection_after_create(tmp_path):
+    chroma_creator = creator(tmp_path, TEXTS)
+    chroma_creator.create_chroma_collection()
+    fingerprint_collection = chroma_creator.db
+    count = fingerprint_collection._collection.count()
+
+    assert chroma_creator.update_chroma_collection("corpus") == (count, 0)
+    assert chroma_creator.db._collection.name == "corpus"
+    assert fingerprint_collection._collection.count() == count
+    assert chroma_creator.update_chroma_collection("corpus") == (0, 0)
+
+
+def test_update_only_embeds_new_documents(tmp_path):
+    assert creator(tmp_path, TEXTS[:3]).update_chroma_collection("corpus") == (3, 0)
+
+    chroma_creator = creator(tmp_path, TEXTS[1:])
+    embeddings = chroma_creator.embed_model.client
+    assert chroma_creator.update_chroma_collection("corpus") == (2, 1)
+    assert embeddings.texts == 2
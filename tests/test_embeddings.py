@@ -0,0 +1,93 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from langchain_core.embeddings import FakeEmbeddings
+from benchmarks.fakes import HashingEmbeddings
+from tasks.task_4 import embedding_cache
+from tasks.task_4.embedding_cache import EmbeddingCache
+from tasks.task_4.task_4_solution import EmbeddingClient
+
+
+class Clock:
+    """
+    Stands in for the time module, so every cache access gets a distinct, increasing timestamp.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        self.now += 1
+        return self.now
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "time", Clock())
+    return str(tmp_path / "embeddings.sqlite")
+
+
+def disk_keys(cache):
+    return {key for key, in cache.connection.execute("SELECT key FROM embeddings")}
+
+
+def test_injected_clients_only_need_the_embeddings_interface():
+    client = EmbeddingClient("fake", project=None, location=None, client=FakeEmbeddings(size=8), max_concurrency=1)
+    vectors = client.embed_documents(["a", "b"])
+    assert len(vectors) == 2 and all(len(vector) == 8 for vector in vectors)
+    assert len(client.embed_query("a")) == 8
+
+
+def test_cached_vectors_round_trip_as_float32(cache_path):
+    cache = EmbeddingCache(cache_path)
+    cache.put_many({"a": [0.1, 0.2, 0.3]})
+    assert cache.get_many(["a", "b"]) == {"a": pytest.approx([0.1, 0.2, 0.3], abs=1e-7)}
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+    # A new instance starts with an empty memory tier and reads the database
+    reopened = EmbeddingCache(cache_path)
+    assert reopened.get_many(["a"]) == {"a": pytest.approx([0.1, 0.2, 0.3], abs=1e-7)}
+
+
+def test_memory_tier_evicts_the_least_recently_used_vector(cache_path):
+    cache = EmbeddingCache(cache_path, max_memory_entries=2)
+    cache.put_many({"a": [1.0], "b": [2.0]})
+    cache.get_many(["a"])
+    cache.put_many({"c": [3.0]})
+    assert list(cache.memory) == ["a", "c"]
+
+    # Evicted vectors are still served from the database and return to the memory tier
+    assert cache.get_many(["b"]) == {"b": [2.0]}
+    assert list(cache.memory) == ["c", "b"]
+
+
+def test_memory_hits_do_not_read_the_database(cache_path):
+    cache = EmbeddingCache(cache_path)
+    cache.put_many({"a": [1.0]})
+    cache.connection.execute("DELETE FROM embeddings")
+    assert cache.get_many(["a"]) == {"a": [1.0]}
+
+
+def test_database_evicts_the_least_recently_used_rows(cache_path):
+    cache = EmbeddingCache(cache_path, max_memory_entries=0, max_disk_entries=3)
+    cache.put_many({"a": [1.0]})
+    cache.put_many({"b": [2.0]})
+    cache.put_many({"c": [3.0]})
+    cache.get_many(["a"])
+    cache.put_many({"d": [4.0], "e": [5.0]})
+    assert disk_keys(cache) == {"a", "d", "e"}
+
+
+def test_client_only_embeds_texts_missing_from_the_cache(tmp_path):
+    embeddings = HashingEmbeddings(dimensions=16)
+    client = EmbeddingClient(
+        "hashing", project=None, location=None, cache_path=str(tmp_path / "embeddings.sqlite"), client=embeddings
+    )
+    first = client.embed_documents(["a", "b", "a"])
+    assert embeddings.texts == 2
+    assert client.embed_documents(["b", "c"])[0] == pytest.approx(first[1], abs=1e-7)
+    assert embeddings.texts == 3
@@ -0,0 +1,107 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.fakes import FakeQuizLLM
+from tasks.instrumentation import Instrumentation, OpenTelemetryExporter, RingBufferExporter, instrumentation
+from tasks.task_8.task_8_solution import QuizGenerator
+from test_quiz_validation import StaticVectorstore
+
+
+@pytest.fixture
+def records():
+    exporter = RingBufferExporter()
+    instrumentation.enable(exporter)
+    yield exporter.records
+    instrumentation.disable()
+
+
+def spans_by_name(records):
+    spans = {}
+    for record in records:
+        if record["type"] == "span":
+            spans.setdefault(record["name"], []).append(record)
+    return spans
+
+
+@pytest.mark.parametrize("stream_tokens", [False, True])
+def test_quiz_spans_form_one_tree_across_worker_threads(records, stream_tokens):
+    generator = QuizGenerator("cell energy", 3, StaticVectorstore(), stream_tokens=stream_tokens, llm=FakeQuizLLM())
+    assert len(generator.generate_quiz()) == 3
+
+    spans = spans_by_name(records)
+    quiz = spans["generate_quiz"][0]
+    assert quiz["parent_id"] is None
+    assert len(spans["generate_question"]) == 3
+    questions = {span["span_id"] for span in spans["generate_question"]}
+    assert all(span["parent_id"] == quiz["span_id"] for span in spans["generate_question"])
+    assert len(spans["llm"]) == len(spans["parse_json"]) == 3
+    assert all(span["parent_id"] in questions for span in spans["llm"] + spans["parse_json"])
+
+
+def test_streamed_llm_calls_closed_early_record_their_output(records):
+    generator = QuizGenerator("cell energy", 2, StaticVectorstore(), stream_tokens=True, llm=FakeQuizLLM())
+    generator.generate_quiz()
+
+    for span in spans_by_name(records)["llm"]:
+        assert "error" not in span["attributes"]
+        assert span["attributes"]["output_chars"] > 0
+    assert sum(record["value"] for record in records if record["name"] == "llm.output_tokens") > 0
+
+
+def test_spans_opened_between_yielded_questions_are_not_children_of_the_quiz(records):
+    quiz = QuizGenerator("cell energy", 2, StaticVectorstore(), max_concurrency=1, llm=FakeQuizLLM()).iter_quiz()
+    next(quiz)
+    with instrumentation.span("render_question"):
+        pass
+    quiz.close()
+
+    spans = spans_by_name(records)
+    assert spans["render_question"][0]["parent_id"] is None
+    assert spans["generate_quiz"][0]["parent_id"] is None
+    assert "error" not in spans["generate_quiz"][0]["attributes"]
+
+
+def traced(max_pending=10000):
+    trace_sdk = pytest.importorskip("opentelemetry.sdk.trace")
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    spans = InMemorySpanExporter()
+    provider = trace_sdk.TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(spans))
+    instrumentation = Instrumentation()
+    instrumentation.enable(OpenTelemetryExporter(tracer_provider=provider, max_pending=max_pending))
+    return instrumentation, spans
+
+
+def test_opentelemetry_spans_keep_their_parent():
+    instrumentation, spans = traced()
+    with instrumentation.span("quiz"):
+        with instrumentation.span("retrieve"):
+            with instrumentation.span("embed"):
+                pass
+        with instrumentation.span("llm"):
+            pass
+
+    exported = {span.name: span for span in spans.get_finished_spans()}
+    assert exported["quiz"].parent is None
+    assert exported["retrieve"].parent.span_id == exported["quiz"].context.span_id
+    assert exported["llm"].parent.span_id == exported["quiz"].context.span_id
+    assert exported["embed"].parent.span_id == exported["retrieve"].context.span_id
+    assert len({span.context.trace_id for span in exported.values()}) == 1
+
+
+def test_children_of_a_missing_parent_are_exported_without_it():
+    instrumentation, spans = traced(max_pending=2)
+    with instrumentation.span("quiz"):
+        for _ in range(3):
+            with instrumentation.span("llm"):
+                pass
+        assert len(spans.get_finished_spans()) == 3
+        with instrumentation.span("llm"):
+            pass
+        instrumentation.disable()
+    assert [span.name for span in spans.get_finished_spans()] == ["llm"] * 4
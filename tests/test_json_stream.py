@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from langchain_core.output_parsers import JsonOutputParser
+from tasks.task_8.json_stream import JsonPrefixValidator
+
+QUESTION = {
+    "question": "Which organelle produces most of the cell's energy?",
+    "choices": [
+        {"key": "A", "value": "Nucleus"},
+        {"key": "B", "value": "Mitochondria"},
+        {"key": "C", "value": "Ribosome"},
+        {"key": "D", "value": "Golgi apparatus"},
+    ],
+    "answer": "B",
+    "explanation": "Mitochondria produce ATP through cellular respiration.",
+}
+
+
+def feed_in_chunks(text, size=7):
+    validator = JsonPrefixValidator()
+    for start in range(0, len(text), size):
+        if not validator.feed(text[start:start + size]):
+            break
+    return validator
+
+
+def test_complete_object_is_valid():
+    validator = feed_in_chunks(json.dumps(QUESTION))
+    assert validator.valid and validator.complete
+    assert json.loads(validator.document) == QUESTION
+
+
+def test_raw_control_characters_inside_strings_are_accepted():
+    text = '{"explanation": "line1\nline2\tindented"}'
+    validator = feed_in_chunks(text)
+    assert validator.valid and validator.complete
+    assert JsonOutputParser().parse(validator.document) == JsonOutputParser().parse(text)
+
+
+def test_prose_before_a_fence_is_skipped():
+    text = "Here is your question:\n```json\n" + json.dumps(QUESTION) + "\n```"
+    validator = feed_in_chunks(text)
+    assert validator.valid and validator.complete
+    assert JsonOutputParser().parse(validator.document) == JsonOutputParser().parse(text) == QUESTION
+
+
+def test_prose_before_an_object_is_skipped():
+    validator = feed_in_chunks("Sure! Use `json` like this: " + json.dumps(QUESTION))
+    assert validator.valid and validator.complete
+    assert json.loads(validator.document) == QUESTION
+
+
+def test_prose_without_json_is_rejected_after_the_preamble_limit():
+    validator = feed_in_chunks("I cannot help with that. " * 100)
+    assert not validator.valid
+    assert len(validator.document) == 0
+
+
+def test_malformed_json_is_rejected_early():
+    validator = JsonPrefixValidator()
+    assert validator.feed('{"question": "What?", "choices": [')
+    assert not validator.feed('}')
+
+
+def test_truncated_json_is_valid_but_not_complete():
+    text = json.dumps(QUESTION)
+    validator = feed_in_chunks(text[:len(text) // 2])
+    assert validator.valid and not validator.complete
+
+
+def test_text_after_the_document_is_ignored():
+    validator = feed_in_chunks(json.dumps(QUESTION) + "\n```\nLet me know if you need more.")
+    assert validator.valid and validator.complete
+    assert json.loads(validator.document) == QUESTION
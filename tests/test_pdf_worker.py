@@ -0,0 +1,56 @@
+import io
+import os
+import sys
+import tracemalloc
+from multiprocessing import shared_memory
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pypdf import PdfReader
+from benchmarks.synthetic_pdf import make_pdf
+from tasks.task_3 import pdf_worker
+
+
+@pytest.fixture
+def shared_pdf():
+    data = make_pdf(6, padding_bytes=4_000_000)
+    shm = shared_memory.SharedMemory(create=True, size=len(data))
+    shm.buf[:len(data)] = data
+    yield shm.name, data
+    _, file, _ = pdf_worker._worker_reader
+    if file is not None:
+        file.close()
+    pdf_worker._worker_reader = (None, None, None)
+    shm.close()
+    shm.unlink()
+
+
+def test_shared_memory_file_reads_and_seeks_like_bytes_io(shared_pdf):
+    name, data = shared_pdf
+    file = pdf_worker.SharedMemoryFile(shared_memory.SharedMemory(name=name), 1000)
+    expected = io.BytesIO(data[:1000])
+    try:
+        for offset, whence, count in [(0, io.SEEK_SET, 10), (5, io.SEEK_CUR, 20), (-30, io.SEEK_END, 100), (0, io.SEEK_END, 5)]:
+            assert file.seek(offset, whence) == expected.seek(offset, whence)
+            assert file.read(count) == expected.read(count)
+            assert file.tell() == expected.tell()
+    finally:
+        file.close()
+
+
+def test_page_ranges_are_parsed_from_shared_memory_without_copying_the_file(shared_pdf):
+    name, data = shared_pdf
+    expected = [page.extract_text() for page in PdfReader(io.BytesIO(data)).pages]
+
+    tracemalloc.start()
+    try:
+        first = pdf_worker.extract_page_range(name, len(data), 0, 3)
+        second = pdf_worker.extract_page_range(name, len(data), 3, 6)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert [text for _, text in first + second] == expected
+    assert [page_number for page_number, _ in first + second] == list(range(6))
+    assert peak < len(data) / 2
@@ -0,0 +1,85 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tasks.task_8.question_index import QuestionIndex
+
+WORDS = "cell energy mitochondria membrane protein enzyme nucleus ribosome glucose oxygen carbon transport".split()
+
+
+def question(rng, length=12):
+    return "Which " + " ".join(rng.choice(WORDS) for _ in range(length)) + "?"
+
+
+def hamming(first, second):
+    return bin(first ^ second).count("1")
+
+
+def test_normalized_variants_are_duplicates():
+    index = QuestionIndex()
+    index.add("What is the powerhouse of the cell?")
+    assert index.contains("what  is the POWERHOUSE of the cell")
+    assert index.contains("What is the powerhouse of the céll?!")
+    assert not index.contains("What is the nucleus of the cell?")
+    assert len(index) == 1
+
+
+def test_band_ranges_cover_every_bit_once():
+    for distance in range(0, QuestionIndex.HASH_BITS):
+        ranges = QuestionIndex._band_ranges(distance)
+        assert len(ranges) == distance + 1
+        assert ranges[0][0] == 0 and ranges[-1][1] == QuestionIndex.HASH_BITS
+        assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+
+
+@pytest.mark.parametrize("distance", [0, 3, 8, 16])
+def test_banded_lookup_matches_a_brute_force_hamming_scan(distance):
+    rng = random.Random(distance)
+    index = QuestionIndex(near_duplicate_distance=distance)
+    indexed = [question(rng) for _ in range(40)]
+    for text in indexed:
+        index.add(text)
+    simhashes = [QuestionIndex.simhash(QuestionIndex.normalize(text)) for text in indexed]
+
+    # Paraphrases change one word of an indexed question, so some fall within the distance
+    queries = [question(rng) for _ in range(40)]
+    for text in indexed:
+        words = text.split()
+        words[rng.randrange(1, len(words))] = rng.choice(WORDS)
+        queries.append(" ".join(words))
+
+    near = 0
+    for text in queries:
+        simhash = QuestionIndex.simhash(QuestionIndex.normalize(text))
+        expected = text in indexed or any(hamming(simhash, other) <= distance for other in simhashes)
+        assert index.contains(text) == expected
+        near += expected
+    assert near > 0
+
+
+def test_near_duplicates_are_only_detected_when_enabled():
+    text = "Which organelle produces most of the energy used by a eukaryotic cell during respiration?"
+    paraphrase = "Which organelle produces most of the energy used by an eukaryotic cell during respiration?"
+    distance = hamming(*(QuestionIndex.simhash(QuestionIndex.normalize(value)) for value in (text, paraphrase)))
+
+    exact, near = QuestionIndex(), QuestionIndex(near_duplicate_distance=max(distance, 1))
+    for index in (exact, near):
+        index.add(text)
+    assert not exact.contains(paraphrase)
+    assert near.contains(paraphrase)
+
+
+def test_clear_empties_the_index():
+    index = QuestionIndex(near_duplicate_distance=4)
+    index.add("What is the powerhouse of the cell?")
+    index.clear()
+    assert len(index) == 0
+    assert not index.contains("What is the powerhouse of the cell?")
+
+
+def test_distance_must_fit_the_hash():
+    with pytest.raises(ValueError):
+        QuestionIndex(near_duplicate_distance=QuestionIndex.HASH_BITS)
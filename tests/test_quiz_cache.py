@@ -0,0 +1,106 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tasks.task_8 import quiz_cache
+from tasks.task_8.quiz_cache import QuizResponseCache
+
+
+class Clock:
+    """
+    Stands in for the time module with a time that only moves when the test advances it.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(quiz_cache, "time", clock)
+    return clock
+
+
+def questions(*texts):
+    return [{"question": text, "answer": "A"} for text in texts]
+
+
+def test_exact_topic_hit_ignores_case_and_punctuation(clock):
+    cache = QuizResponseCache()
+    cache.put("corpus", "Cell energy", "gemini-pro", 0.8, questions("Q1", "Q2"))
+    assert cache.get("corpus", "cell ENERGY!", "gemini-pro", 0.8) == questions("Q1", "Q2")
+    assert cache.get("other corpus", "cell energy", "gemini-pro", 0.8) == []
+    assert cache.get("corpus", "cell energy", "gemini-pro", 0.2) == []
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_returned_questions_are_copies(clock):
+    cache = QuizResponseCache()
+    cache.put("corpus", "cells", "gemini-pro", 0.8, questions("Q1"))
+    cache.get("corpus", "cells", "gemini-pro", 0.8)[0]["answer"] = "B"
+    assert cache.get("corpus", "cells", "gemini-pro", 0.8) == questions("Q1")
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = QuizResponseCache(ttl_seconds=60)
+    cache.put("corpus", "cells", "gemini-pro", 0.8, questions("Q1"))
+    clock.now += 60
+    assert cache.get("corpus", "cells", "gemini-pro", 0.8) == questions("Q1")
+    clock.now += 1
+    assert cache.get("corpus", "cells", "gemini-pro", 0.8) == []
+    assert not cache.entries
+
+
+def test_the_least_recently_used_entry_is_evicted(clock):
+    cache = QuizResponseCache(max_entries=2)
+    cache.put("corpus", "cells", "gemini-pro", 0.8, questions("Q1"))
+    cache.put("corpus", "atoms", "gemini-pro", 0.8, questions("Q2"))
+    cache.get("corpus", "cells", "gemini-pro", 0.8)
+    cache.put("corpus", "stars", "gemini-pro", 0.8, questions("Q3"))
+    assert cache.get("corpus", "atoms", "gemini-pro", 0.8) == []
+    assert cache.get("corpus", "cells", "gemini-pro", 0.8) == questions("Q1")
+
+
+def test_puts_merge_unique_questions_into_the_entry(clock):
+    cache = QuizResponseCache(ttl_seconds=60)
+    cache.put("corpus", "cells", "gemini-pro", 0.8, questions("Q1", "Q2"))
+    clock.now += 30
+    cache.put("corpus", "cells", "gemini-pro", 0.8, questions("q1?", "Q3"))
+    assert cache.get("corpus", "cells", "gemini-pro", 0.8) == questions("Q1", "Q2", "Q3")
+
+    # Merging does not extend the entry's lifetime
+    clock.now += 31
+    assert cache.get("corpus", "cells", "gemini-pro", 0.8) == []
+
+
+def test_similar_topics_hit_above_the_threshold(clock):
+    cache = QuizResponseCache(similarity_threshold=0.9)
+    cache.put("corpus", "cell energy", "gemini-pro", 0.8, questions("Q1"), topic_embedding=[1.0, 0.0])
+    cache.put("corpus", "atoms", "gemini-pro", 0.8, questions("Q2"), topic_embedding=[0.0, 1.0])
+
+    assert cache.get("corpus", "mitochondria", "gemini-pro", 0.8, topic_embedding=[2.0, 0.2]) == questions("Q1")
+    assert cache.get("corpus", "mitochondria", "gemini-pro", 0.8, topic_embedding=[1.0, 1.0]) == []
+    assert cache.get("corpus", "mitochondria", "gemini-pro", 0.8) == []
+    # Similar topics are only interchangeable on the same corpus and model settings
+    assert cache.get("other corpus", "mitochondria", "gemini-pro", 0.8, topic_embedding=[1.0, 0.0]) == []
+    assert cache.get("corpus", "mitochondria", "gemini-pro", 0.2, topic_embedding=[1.0, 0.0]) == []
+
+
+def test_similarity_lookup_is_off_without_a_threshold(clock):
+    cache = QuizResponseCache()
+    cache.put("corpus", "cell energy", "gemini-pro", 0.8, questions("Q1"), topic_embedding=[1.0, 0.0])
+    assert cache.get("corpus", "mitochondria", "gemini-pro", 0.8, topic_embedding=[1.0, 0.0]) == []
+
+
+def test_sample_returns_a_subset_of_the_cached_questions(clock):
+    cache = QuizResponseCache()
+    cache.put("corpus", "cells", "gemini-pro", 0.8, questions("Q1", "Q2", "Q3", "Q4"))
+    sample = cache.sample("corpus", "cells", "gemini-pro", 0.8, 2)
+    assert len(sample) == 2 and all(question in questions("Q1", "Q2", "Q3", "Q4") for question in sample)
+    assert len(cache.sample("corpus", "cells", "gemini-pro", 0.8, 10)) == 4
@@ -0,0 +1,98 @@
+import os
+import re
+import sys
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+from benchmarks.fakes import FakeQuizLLM, HashingEmbeddings
+from tasks.task_4.task_4_solution import EmbeddingClient
+from tasks.task_8.question_pool import QuestionPool
+from tasks.task_8.task_8_solution import QuizGenerator
+from test_quiz_validation import StaticVectorstore
+
+
+def test_all_questions_are_requested_in_one_round_by_default():
+    generator = QuizGenerator("cell energy", 10, StaticVectorstore(), llm=FakeQuizLLM())
+    assert generator.max_concurrency == 10
+
+
+def test_semantic_dedup_embeds_each_round_with_one_call():
+    embeddings = HashingEmbeddings()
+    generator = QuizGenerator(
+        "cell energy", 5, StaticVectorstore(), semantic_threshold=0.99,
+        embed_client=EmbeddingClient("hashing", project=None, location=None, client=embeddings),
+        llm=FakeQuizLLM()
+    )
+    assert len(generator.generate_quiz()) == 5
+    assert embeddings.calls == 1
+
+
+def test_cancel_stops_generation_before_queued_requests_are_sent():
+    cancel = threading.Event()
+    llm = FakeQuizLLM(latency=0.05)
+    generator = QuizGenerator("cell energy", 6, StaticVectorstore(), max_concurrency=1, llm=llm, cancel=cancel)
+    questions = []
+    for question in generator.iter_quiz():
+        questions.append(question)
+        cancel.set()
+    assert len(questions) < 6
+    assert llm.calls < 6
+
+
+class StaticCollection(StaticVectorstore):
+    """
+    A vectorstore that also returns a fixed set of chunks and embeddings, like a Chroma collection.
+    """
+
+    def get(self, include=None):
+        texts = [f"Chunk {index} about mitochondria and cell energy." for index in range(4)]
+        return {"documents": texts, "embeddings": HashingEmbeddings().embed_documents(texts)}
+
+
+def test_question_pool_build_waits_for_the_live_quiz():
+    class Creator(StaticVectorstore):
+        db = StaticCollection()
+
+    live_quiz_done = threading.Event()
+    llm = FakeQuizLLM()
+    pool = QuestionPool(Creator(), num_clusters=1, questions_per_cluster=2, llm=llm)
+    pool.start(after=live_quiz_done)
+    assert not pool.wait(0.2)
+    assert llm.calls == 0
+
+    live_quiz_done.set()
+    assert pool.wait(10)
+    assert len(pool) == 2
+
+
+class RankedVectorstore:
+    """
+    A vectorstore whose retriever returns the chunks CHUNK0, CHUNK1, ... up to the requested k.
+    """
+
+    def as_retriever(self, search_kwargs=None):
+        k = (search_kwargs or {}).get("k", 4)
+        return RunnableLambda(lambda query: [Document(page_content=f"CHUNK{index}") for index in range(k)])
+
+
+class FailingChunkLLM(FakeQuizLLM):
+    """
+    Returns a truncated question for prompts containing CHUNK2 and records the chunks of every prompt.
+    """
+
+    prompts: list = []
+
+    def _respond(self, prompt):
+        self.prompts.append(prompt)
+        text = super()._respond(prompt)
+        return text[:len(text) // 2] if "CHUNK2" in prompt else text
+
+
+def test_top_up_requests_use_chunks_no_question_has_seen():
+    llm = FailingChunkLLM(prompts=[])
+    generator = QuizGenerator("cell energy", 3, RankedVectorstore(), distinct_context=True, max_concurrency=1, llm=llm)
+    assert len(generator.generate_quiz()) == 3
+    requested = [re.findall(r"CHUNK\d+", prompt) for prompt in llm.prompts]
+    assert requested == [["CHUNK0"], ["CHUNK1"], ["CHUNK2"], ["CHUNK3"]]
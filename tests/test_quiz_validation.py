@@ -0,0 +1,88 @@
+import copy
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+from benchmarks.fakes import FakeQuizLLM
+from tasks.task_8.task_8_solution import QuizGenerator
+
+QUESTION = {
+    "question": "Which organelle produces most of the cell's energy?",
+    "choices": [
+        {"key": "A", "value": "Nucleus"},
+        {"key": "B", "value": "Mitochondria"},
+        {"key": "C", "value": "Ribosome"},
+        {"key": "D", "value": "Golgi apparatus"},
+    ],
+    "answer": "B",
+    "explanation": "Mitochondria produce ATP through cellular respiration.",
+}
+
+
+class StaticVectorstore:
+    """
+    A vectorstore whose retriever returns the same chunks for every query.
+    """
+
+    def as_retriever(self, **kwargs):
+        return RunnableLambda(lambda query: [
+            Document(page_content=f"Chunk {index} about mitochondria and cell energy.") for index in range(4)
+        ])
+
+
+def with_changes(**changes):
+    question = copy.deepcopy(QUESTION)
+    for key, value in changes.items():
+        if value is None:
+            del question[key]
+        else:
+            question[key] = value
+    return question
+
+
+def test_complete_question_is_well_formed():
+    assert QuizGenerator.is_well_formed(QUESTION)
+
+
+def test_incomplete_questions_are_not_well_formed():
+    assert not QuizGenerator.is_well_formed(with_changes(answer=None))
+    assert not QuizGenerator.is_well_formed(with_changes(explanation=None))
+    assert not QuizGenerator.is_well_formed(with_changes(answer="E"))
+    assert not QuizGenerator.is_well_formed(with_changes(choices=QUESTION["choices"][:3]))
+    assert not QuizGenerator.is_well_formed(with_changes(choices=QUESTION["choices"][:3] + [{}]))
+    assert not QuizGenerator.is_well_formed(with_changes(question=""))
+    assert not QuizGenerator.is_well_formed(["not", "a", "question"])
+
+
+def test_truncated_responses_are_rejected_and_counted_as_wasted():
+    generator = QuizGenerator(
+        "cell energy", 3, StaticVectorstore(), backoff_base=0, llm=FakeQuizLLM(failure_rate=1.0)
+    )
+    assert generator.generate_quiz() == []
+    assert generator.wasted_attempts == generator.max_attempts
+
+
+def test_valid_responses_are_accepted():
+    generator = QuizGenerator("cell energy", 3, StaticVectorstore(), backoff_base=0, llm=FakeQuizLLM())
+    questions = generator.generate_quiz()
+    assert len(questions) == 3
+    assert all(QuizGenerator.is_well_formed(question) for question in questions)
+    assert generator.wasted_attempts == 0
+
+
+def test_batch_mode_rejects_the_incomplete_tail_of_a_truncated_array():
+    generator = QuizGenerator(
+        "cell energy", 4, StaticVectorstore(), batch_mode=True, backoff_base=0, llm=FakeQuizLLM(failure_rate=1.0)
+    )
+    questions = generator.generate_quiz()
+    assert questions
+    assert all(QuizGenerator.is_well_formed(question) for question in questions)
+    assert generator.wasted_attempts > 0
+
+
+def test_batch_mode_accepts_complete_arrays():
+    generator = QuizGenerator("cell energy", 4, StaticVectorstore(), batch_mode=True, backoff_base=0, llm=FakeQuizLLM())
+    assert len(generator.generate_quiz()) == 4
+    assert generator.wasted_attempts == 0
@@ -0,0 +1,79 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tasks.task_5.text_splitter import RecursiveTokenSplitter
+
+
+def sentence(label, words=6):
+    return " ".join([label] + [f"word{index}" for index in range(words)]) + "."
+
+
+# Three paragraphs of four sentences each, every sentence 45 characters long
+PARAGRAPHS = [" ".join(sentence(f"S{paragraph}{index}") for index in range(4)) for paragraph in range(3)]
+TEXT = "\n\n".join(PARAGRAPHS)
+
+
+def split(**settings):
+    settings = {"chunk_size": 100, "chunk_overlap": 50, **settings}
+    return RecursiveTokenSplitter(**settings).split_text(TEXT)
+
+
+def test_chunks_fit_the_size_and_keep_every_sentence():
+    chunks = split()
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    for paragraph in range(3):
+        for index in range(4):
+            assert any(sentence(f"S{paragraph}{index}") in chunk for chunk in chunks)
+
+
+def test_chunks_ending_inside_a_paragraph_repeat_their_last_sentence():
+    chunks = split()
+    assert chunks[0] == f"{sentence('S00')} {sentence('S01')}"
+    assert chunks[1].startswith(sentence("S01"))
+
+
+def overlaps(chunks):
+    """
+    Returns the text each chunk repeats from the end of the previous chunk.
+    """
+    return [
+        next((chunk[:size] for size in range(len(chunk), 0, -1) if previous.endswith(chunk[:size])), "")
+        for previous, chunk in zip(chunks, chunks[1:])
+    ]
+
+
+def test_chunks_ending_at_a_paragraph_break_have_no_overlap():
+    chunks = split()
+    for previous, shared in zip(chunks, overlaps(chunks)):
+        if previous.endswith((sentence("S03"), sentence("S13"))):
+            assert shared == ""
+    assert split(chunk_size=200)[:2] == [PARAGRAPHS[0], PARAGRAPHS[1]]
+
+
+def test_overlap_never_reaches_back_past_a_paragraph_break():
+    for shared in overlaps(split(chunk_size=140, chunk_overlap=100)):
+        assert "\n" not in shared and "S03" not in shared and "S13" not in shared
+
+
+def test_fixed_overlap_repeats_text_across_paragraph_breaks():
+    shared = overlaps(split(adaptive_overlap=False))
+    assert any(text.startswith("S03") for text in shared)
+    assert all(shared)
+
+
+def test_overlap_is_limited_to_chunk_overlap():
+    for adaptive_overlap in (True, False):
+        chunks = split(chunk_size=140, chunk_overlap=50, adaptive_overlap=adaptive_overlap)
+        assert all(len(shared) <= 50 for shared in overlaps(chunks))
+
+
+def test_words_longer_than_a_chunk_are_cut():
+    chunks = RecursiveTokenSplitter(chunk_size=10, chunk_overlap=0).split_text("x" * 25)
+    assert chunks == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_length_function_sets_the_unit():
+    chunks = RecursiveTokenSplitter(chunk_size=8, chunk_overlap=0, length_function=lambda text: len(text.split())).split_text(TEXT)
+    assert all(len(chunk.split()) <= 8 for chunk in chunks)
+    assert chunks[0] == sentence("S00")